@@ -1,98 +1,85 @@
 import pandas as pd
-import uuid
-import json
 from schema.pydantic.base_schema import *
 from schema.connect_db import *
+from schema.bulk_loader import BulkLoader
+from schema.queries import sync_place_rating_columns
+from columnar import *
+from streaming import stream_ingest, write_users_and_reviews
+from review_filter import filter_new_reviews
 from datetime import datetime
 
 ## We want to map business_name,author_name,text,photo,rating,rating_category of the original dataset
 ## to our defined base schema fields. Then push the mapped data to the database.
 
+SOURCE = "kaggle" # part of the review id, keeps ids of different datasets apart
+
+# Column-wise mapping of the raw CSV to review and place frames (see columnar.py)
+def map_columns(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Validate and convert column by column; IDs are generated once per distinct value;
+    # review ids are derived from the content, so re-ingesting a review gives the same id
+    place_ids = uuid5_column(string_column(df, "business_name"))
+    frame = pd.DataFrame({
+        "place_id": place_ids,
+        "user_id": uuid5_column(string_column(df, "author_name")),
+        "review_id": review_id_column(SOURCE, place_ids, string_column(df, "author_name"), string_column(df, "text")),
+        "place_name": string_column(df, "business_name"),
+        "user_name": string_column(df, "author_name"),
+        "rating": float_column(df, "rating"),
+        "text_chunk": string_column(df, "text"),
+        "category": df["rating_category"].fillna("").astype(str) if "rating_category" in df else "",
+        "language": "en", # This dataset is 100% English
+        "timestamp": datetime.now() # Take now as timestamp
+    })
+    # Place stats are aggregated from the reviews in the file
+    places = frame.groupby("place_id", sort=False).agg(
+        name=("place_name", "first"),
+        category=("category", "first"),
+        avg_rating=("rating", "mean"),
+        num_reviews=("rating", "size")
+    ).reset_index()
+    places = places.assign(address="", url="", lat=0.0, lng=0.0)
+    return frame, places[PLACE_COLUMNS]
+
 def ingest_data(file_path: str) -> tuple[list[Review], dict[str, User], dict[str, Place]]:
-    df = pd.read_csv(file_path)
-    reviews: list[Review] = []
-    users: dict[str, User] = {}
-    places: dict[str, Place] = {}
-    for _, row in df.iterrows():
-        # Generate IDs to be mapped to the schema for SQL ingestion
-        place_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, row["business_name"]))
-        user_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, row["author_name"]))
-        review_id = str(uuid.uuid4())
-        # Build review object 
-        review = Review(
-            review_id=review_id,
-            place_id=place_id,
-            user_id=user_id,
-            user_name=row["author_name"],
-            rating=float(row["rating"]),
-            text_chunk=row["text"],
-            language="en",  # This dataset is 100% English
-            timestamp=datetime.now() # Take now as timestamp
-        )
-        reviews.append(review)
-        # Build user object if not exists; user can have multiple reviews
-        if user_id not in users:
-            users[user_id] = User(user_id=user_id, name=row["author_name"], reviews=[])
-        users[user_id].reviews.append(review_id)
-        # Build place object if not exists; place can have multiple reviews
-        if place_id not in places:
-            places[place_id] = Place(
-                place_id=place_id,
-                name=row["business_name"],
-                category=row.get("rating_category", ""),
-                address="", url="", lat=0.0, lng=0.0,
-                avg_rating=float(row["rating"]),
-                num_reviews=1
-            )
-        else:
-            # Update place stats if reviewed before
-            places[place_id].num_reviews += 1
-            places[place_id].avg_rating = (
-                places[place_id].avg_rating * (places[place_id].num_reviews - 1) + float(row["rating"])
-            ) / places[place_id].num_reviews
+    return build_models(*map_columns(pd.read_csv(file_path)))
+
+# Rating statistics of these places are kept by the database (place_rating_stats) and copied into
+# place.avg_rating / num_reviews once the reviews are written, so they cover every stored review
+KAGGLE_PLACE_COLUMNS = ["place_id", "name", "category", "address", "url", "lat", "lng"]
 
-    return reviews, users, places
+def write_chunk(loader: BulkLoader, reviews: pd.DataFrame, places: pd.DataFrame) -> None:
+    loader.load("place", KAGGLE_PLACE_COLUMNS, column_rows(places, KAGGLE_PLACE_COLUMNS), conflict=["place_id"])
+    write_users_and_reviews(loader, reviews)
+    sync_place_rating_columns(loader.conn, places["place_id"].astype(str).tolist())
 
-def push_to_postgres(reviews: list[Review], users: dict[str, User], places: dict[str, Place]) -> None:
-    conn = establish_postgres_connection()
-    cursor = conn.cursor()
-    # Insert places to the place table
-    for place in places.values():
-        cursor.execute(
-            """
-            INSERT INTO place (place_id, name, category, address, url, lat, lng, avg_rating, num_reviews)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (place_id) DO UPDATE
-            SET avg_rating = EXCLUDED.avg_rating,
-                num_reviews = EXCLUDED.num_reviews;
-            """, 
-            (place.place_id, place.name, place.category, place.address, place.url, place.lat, place.lng, place.avg_rating, place.num_reviews)
-        )
-    print("Successfully inserted places to the place table")
-    # Insert users to the users table
-    for user in users.values():
-        cursor.execute(
-            """
-            INSERT INTO users (user_id, name, reviews)
-            VALUES (%s,%s,%s)
-            ON CONFLICT (user_id) DO UPDATE
-            SET reviews = EXCLUDED.reviews;
-            """, 
-            (user.user_id, user.name, json.dumps(user.reviews))
-        )
-    print("Successfully inserted users to the users table")
-    # Insert reviews to the review table
-    for review in reviews:
-        cursor.execute(
-            """
-            INSERT INTO review (review_id, place_id, user_id, user_name, rating, text, language, timestamp)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (review_id) DO NOTHING;
-            """, 
-            (review.review_id, review.place_id, review.user_id, review.user_name, review.rating, review.text_chunk, review.language, review.timestamp)
-        )
-    print("Successfully inserted reviews to the review table")
+# Streaming mode: chunked, one transaction per chunk, resumes after a failure
+def ingest_stream(file_path: str, chunk_size: int = 10_000, skip_existing: bool = True) -> int:
+    return stream_ingest(file_path, map_columns, write_chunk, chunk_size=chunk_size, skip_existing=skip_existing)
+
+def push_to_postgres(reviews: list[Review], users: dict[str, User], places: dict[str, Place],
+                     batch_size: int = 50_000, transaction: str = "load", skip_existing: bool = True) -> None:
+    with get_postgres_pool().connection() as conn:
+        if skip_existing:
+            reviews, users = filter_new_reviews(conn, reviews, users)
+        with BulkLoader(conn, batch_size=batch_size, transaction=transaction) as loader:
+            # Insert places to the place table
+            loader.load(
+                "place", KAGGLE_PLACE_COLUMNS,
+                ((p.place_id, p.name, p.category, p.address, p.url, p.lat, p.lng) for p in places.values()),
+                conflict=["place_id"]
+            )
+            print("Successfully inserted places to the place table")
+            # Insert users to the users table; their reviews are linked through review.user_id
+            loader.load("users", ["user_id", "name"], ((u.user_id, u.name) for u in users.values()), conflict=["user_id"])
+            print("Successfully inserted users to the users table")
+            # Insert reviews to the review table
+            loader.load(
+                "review", ["review_id", "place_id", "user_id", "user_name", "rating", "text", "language", "timestamp"],
+                ((r.review_id, r.place_id, r.user_id, r.user_name, r.rating, r.text_chunk, r.language, r.timestamp) for r in reviews),
+                conflict=["review_id"]
+            )
+            print("Successfully inserted reviews to the review table")
+            sync_place_rating_columns(conn, [str(place_id) for place_id in places])
 
 if __name__ == "__main__":
-    reviews, users, places = ingest_data(file_path="data/raw/kaggle/KaggleReviews.csv")
-    push_to_postgres(reviews, users, places)
+    ingest_stream(file_path="data/raw/kaggle/KaggleReviews.csv")
@@ -1,96 +1,83 @@
 import pandas as pd
-import uuid
-import json
 from schema.pydantic.base_schema import *
 from schema.connect_db import *
+from schema.bulk_loader import BulkLoader
+from columnar import *
+from streaming import stream_ingest, write_users_and_reviews
+from review_filter import filter_new_reviews
 from datetime import datetime
 
 ## We want to map name,address,category,overall_rating,review_count,website,google_maps_url,lat,lng,author,review_rating,review_text,relative_time,date_retrieved,calculated_date,review_id to our dataset
 
+SOURCE = "google_maps" # part of the review id, keeps ids of different datasets apart
+
+# Column-wise mapping of the raw CSV to review and place frames (see columnar.py)
+def map_columns(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    df = df[df["calculated_date"].notna()] # Reviews without a date are skipped
+    # Validate and convert column by column; IDs are generated once per distinct value;
+    # review ids come from the scraped review_id, and are derived from the content only where it is missing
+    place_ids = uuid5_column(string_column(df, "name"))
+    frame = pd.DataFrame({
+        "place_id": place_ids,
+        "user_id": uuid5_column(string_column(df, "author")),
+        "review_id": review_id_column(SOURCE, place_ids, string_column(df, "author"), string_column(df, "review_text"),
+                                      df["review_id"] if "review_id" in df else None),
+        "user_name": string_column(df, "author"),
+        "rating": float_column(df, "review_rating"),
+        "text_chunk": string_column(df, "review_text"),
+        "language": "", # We don't know yet the language, leave it to preprocessing
+        "timestamp": datetime_column(df, "calculated_date")
+    })
+    # One row per place, taken from its first review; we fetch statistics from Google Maps
+    website = df["website"].fillna("").astype(str)
+    places = pd.DataFrame({
+        "place_id": frame["place_id"],
+        "name": string_column(df, "name"),
+        "category": string_column(df, "category"),
+        "address": string_column(df, "address"),
+        "url": website.where(website != "", df["google_maps_url"].fillna("").astype(str)),
+        "lat": float_column(df, "lat"),
+        "lng": float_column(df, "lng"),
+        "avg_rating": float_column(df, "overall_rating"),
+        "num_reviews": int_column(df, "review_count")
+    }).drop_duplicates("place_id")
+    return frame, places[PLACE_COLUMNS]
+
 def ingest_data(file_path: str) -> tuple[list[Review], dict[str, User], dict[str, Place]]:
-    df = pd.read_csv(file_path)
-    reviews: list[Review] = []
-    users: dict[str, User] = {}
-    places: dict[str, Place] = {}
-    for _, row in df.iterrows():
-        # Generate IDs to be mapped to the schema for SQL ingestion
-        place_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, row["name"]))
-        user_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, row["author"]))
-        review_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, row["review_id"]))
-        if pd.isna(row.get("calculated_date")):
-            continue
-        # Build review object 
-        review = Review(
-            review_id=review_id,
-            place_id=place_id,
-            user_id=user_id,
-            user_name=row["author"],
-            rating=float(row["review_rating"]),
-            text_chunk=row["review_text"],
-            language="",  # We don't know yet the language, leave it to preprocessing
-            timestamp= row["calculated_date"]
-        )
-        reviews.append(review)
-        # Build user object if not exists; user can have multiple reviews
-        if user_id not in users:
-            users[user_id] = User(user_id=user_id, name=row["author"], reviews=[])
-        users[user_id].reviews.append(review_id)
-        # Build place object if not exists; we fetch statistics from Google Maps
-        if place_id not in places:
-            places[place_id] = Place(
-                place_id=place_id,
-                name=row["name"],
-                category=row["category"],
-                address=row["address"],
-                url=row["website"] if row["website"] else row["google_maps_url"], 
-                lat=float(row["lat"]), 
-                lng=float(row["lng"]),
-                avg_rating=float(row["overall_rating"]),
-                num_reviews=int(row["review_count"])
-            )
-            
-    return reviews, users, places
+    return build_models(*map_columns(pd.read_csv(file_path)))
+
+# Place statistics come from Google Maps and overwrite the stored ones
+def write_chunk(loader: BulkLoader, reviews: pd.DataFrame, places: pd.DataFrame) -> None:
+    loader.load("place", PLACE_COLUMNS, column_rows(places, PLACE_COLUMNS), conflict=["place_id"], update=["avg_rating", "num_reviews"])
+    write_users_and_reviews(loader, reviews)
 
-def push_to_postgres(reviews: list[Review], users: dict[str, User], places: dict[str, Place]) -> None:
-    conn = establish_postgres_connection()
-    cursor = conn.cursor()
-    # Insert places to the place table
-    for place in places.values():
-        cursor.execute(
-            """
-            INSERT INTO place (place_id, name, category, address, url, lat, lng, avg_rating, num_reviews)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (place_id) DO UPDATE
-            SET avg_rating = EXCLUDED.avg_rating,
-                num_reviews = EXCLUDED.num_reviews;
-            """, 
-            (place.place_id, place.name, place.category, place.address, place.url, place.lat, place.lng, place.avg_rating, place.num_reviews)
-        )
-    print("Successfully inserted places to the place table")
-    # Insert users to the users table
-    for user in users.values():
-        cursor.execute(
-            """
-            INSERT INTO users (user_id, name, reviews)
-            VALUES (%s,%s,%s)
-            ON CONFLICT (user_id) DO UPDATE
-            SET reviews = EXCLUDED.reviews;
-            """, 
-            (user.user_id, user.name, json.dumps(user.reviews))
-        )
-    print("Successfully inserted users to the users table")
-    # Insert reviews to the review table
-    for review in reviews:
-        cursor.execute(
-            """
-            INSERT INTO review (review_id, place_id, user_id, user_name, rating, text, language, timestamp)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (review_id) DO NOTHING;
-            """, 
-            (review.review_id, review.place_id, review.user_id, review.user_name, review.rating, review.text_chunk, review.language, review.timestamp)
-        )
-    print("Successfully inserted reviews to the review table")
+# Streaming mode: chunked, one transaction per chunk, resumes after a failure
+def ingest_stream(file_path: str, chunk_size: int = 10_000, skip_existing: bool = True) -> int:
+    return stream_ingest(file_path, map_columns, write_chunk, chunk_size=chunk_size, skip_existing=skip_existing)
+
+def push_to_postgres(reviews: list[Review], users: dict[str, User], places: dict[str, Place],
+                     batch_size: int = 50_000, transaction: str = "load", skip_existing: bool = True) -> None:
+    with get_postgres_pool().connection() as conn:
+        if skip_existing:
+            reviews, users = filter_new_reviews(conn, reviews, users)
+        with BulkLoader(conn, batch_size=batch_size, transaction=transaction) as loader:
+            # Insert places to the place table
+            loader.load(
+                "place", ["place_id", "name", "category", "address", "url", "lat", "lng", "avg_rating", "num_reviews"],
+                ((p.place_id, p.name, p.category, p.address, p.url, p.lat, p.lng, p.avg_rating, p.num_reviews) for p in places.values()),
+                conflict=["place_id"], update=["avg_rating", "num_reviews"]
+            )
+            print("Successfully inserted places to the place table")
+            # Insert users to the users table; their reviews are linked through review.user_id
+            loader.load("users", ["user_id", "name"], ((u.user_id, u.name) for u in users.values()), conflict=["user_id"])
+            print("Successfully inserted users to the users table")
+            # Insert reviews to the review table
+            loader.load(
+                "review", ["review_id", "place_id", "user_id", "user_name", "rating", "text", "language", "timestamp"],
+                ((r.review_id, r.place_id, r.user_id, r.user_name, r.rating, r.text_chunk, r.language, r.timestamp) for r in reviews),
+                conflict=["review_id"]
+            )
+            print("Successfully inserted reviews to the review table")
 
 if __name__ == "__main__":
-    reviews, users, places = ingest_data(file_path="data/raw/google_places/google_maps_reviews.csv")
-    push_to_postgres(reviews, users, places)
+    ingest_stream(file_path="data/raw/google_places/google_maps_reviews.csv")
@@ -0,0 +1,114 @@
+import math
+import uuid
+import numpy as np
+from typing import Iterable
+from schema.pydantic.base_schema import Review, User
+
+## Skip reviews that are already stored before sending them to PostgreSQL.
+## Review ids are deterministic (see columnar.review_id_column), so a review seen before always maps to
+## the same id. ExistingReviewFilter loads the ids of the review table once into a Bloom filter
+## (about 10 bits per stored review at a 1% false positive rate). Ids the filter has never seen are new
+## for certain; the few it reports as present are confirmed with one exact lookup per batch, so no new
+## review is ever dropped. Ids written during the run are added to the filter; once it holds more ids
+## than it was sized for, it is reloaded from the review table at twice the size, so the false positive
+## rate stays put however much a run adds (a fresh database starts with room for 1024 reviews).
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1024)
+        self.count = 0 # ids added, duplicates included
+        self.num_bits = int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+
+    # UUIDs are already uniformly distributed, so their two 64-bit halves serve as the two base hashes
+    # of double hashing: position_i = h1 + i * h2 mod num_bits, with an odd step 0 < h2 < num_bits
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        halves = keys.view("<u8").reshape(-1, 2)
+        h1 = halves[:, 0] % np.uint64(self.num_bits)
+        h2 = halves[:, 1] % np.uint64(self.num_bits - 1) | np.uint64(1)
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    # keys: (n, 16) uint8 array of UUID bytes
+    def add(self, keys: np.ndarray) -> None:
+        self.count += len(keys)
+        if len(keys):
+            positions = self._positions(keys).ravel()
+            np.bitwise_or.at(self.bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def might_contain(self, keys: np.ndarray) -> np.ndarray:
+        if not len(keys):
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+def uuid_bytes(ids: Iterable[str]) -> np.ndarray:
+    return np.frombuffer(b"".join(uuid.UUID(i).bytes for i in ids), dtype=np.uint8).reshape(-1, 16)
+
+class ExistingReviewFilter:
+    def __init__(self, conn, error_rate: float = 0.01, fetch_size: int = 100_000):
+        self.conn = conn
+        self.error_rate = error_rate
+        self.fetch_size = fetch_size
+        self.checked = 0
+        self.maybe_present = 0
+        self.confirmed = 0
+        self.reloads = 0
+        self._load()
+
+    # Reads every stored id; the filter gets room for as many reviews again as are stored
+    def _load(self, min_capacity: int = 0) -> None:
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM review")
+            (count,) = cursor.fetchone()
+        self.bloom = BloomFilter(max(count * 2, min_capacity), self.error_rate)
+        # Server-side cursor; ids arrive as raw 16-byte values
+        with self.conn.cursor(name="review_id_prefilter") as cursor:
+            cursor.itersize = self.fetch_size
+            cursor.execute("SELECT uuid_send(review_id) FROM review")
+            while rows := cursor.fetchmany(self.fetch_size):
+                self.bloom.add(np.frombuffer(b"".join(bytes(value) for (value,) in rows), dtype=np.uint8).reshape(-1, 16))
+        self.conn.commit()
+        print(f"Loaded {count} stored review ids into the prefilter ({self.bloom.bits.nbytes / 1e6:.1f} MB)")
+
+    # True for ids not stored yet
+    def new_mask(self, review_ids: list[str]) -> np.ndarray:
+        keys = uuid_bytes(review_ids)
+        maybe = self.bloom.might_contain(keys)
+        is_new = ~maybe
+        if maybe.any():
+            candidates = [review_ids[i] for i in np.flatnonzero(maybe)]
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT review_id::text FROM review WHERE review_id = ANY(%s::uuid[])", (candidates,))
+                stored = {review_id for (review_id,) in cursor.fetchall()}
+            is_new[np.flatnonzero(maybe)] = [review_id not in stored for review_id in candidates]
+            self.maybe_present += len(candidates)
+            self.confirmed += len(stored)
+        self.checked += len(review_ids)
+        return is_new
+
+    # review_ids must be committed: a full filter is rebuilt from the review table
+    def add(self, review_ids: list[str]) -> None:
+        self.bloom.add(uuid_bytes(review_ids))
+        if self.bloom.count > self.bloom.capacity:
+            self.reloads += 1
+            self._load(min_capacity=2 * self.bloom.capacity)
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "maybe_present": self.maybe_present,
+            "already_stored": self.confirmed,
+            "false_positives": self.maybe_present - self.confirmed,
+            "reloads": self.reloads
+        }
+
+# In-memory path: keep only reviews (and their users) that are not stored yet
+def filter_new_reviews(conn, reviews: list[Review], users: dict[str, User]) -> tuple[list[Review], dict[str, User]]:
+    prefilter = ExistingReviewFilter(conn)
+    is_new = prefilter.new_mask([review.review_id for review in reviews])
+    reviews = [review for review, new in zip(reviews, is_new) if new]
+    print(f"Skipping {len(is_new) - len(reviews)} reviews that are already stored")
+    return reviews, {review.user_id: users[review.user_id] for review in reviews}
@@ -0,0 +1,91 @@
+import os
+import hashlib
+import pandas as pd
+from typing import Callable
+from schema.connect_db import get_postgres_pool
+from schema.bulk_loader import BulkLoader
+from columnar import REVIEW_COLUMNS, column_rows, user_frame
+from review_filter import ExistingReviewFilter
+
+## Chunked, resumable CSV ingestion.
+## The CSV is read `chunk_size` rows at a time, so memory stays flat whatever the file size. Every chunk is
+## mapped and written in its own transaction, together with the checkpoint row for the file: the
+## checkpoint can never claim rows that were not committed, and a rerun skips exactly the committed rows.
+## Checkpoints are keyed by the SHA-256 of the file content, so an edited file starts over from row 0.
+## With skip_existing, reviews already in the database are dropped before writing (see review_filter.py).
+## ingest_checkpoint is declared in schema/postgresql/tables.sql; run schema/migrate.py before the first ingest.
+
+# Users and reviews are written the same way for every source.
+# A user's reviews are found through the indexed review.user_id column, so users rows are only inserted
+# once and never rewritten (see schema/queries.py)
+def write_users_and_reviews(loader: BulkLoader, reviews: pd.DataFrame) -> None:
+    users = user_frame(reviews)
+    loader.load("users", ["user_id", "name"], column_rows(users, ["user_id", "name"]), conflict=["user_id"])
+    loader.load("review", ["review_id", "place_id", "user_id", "user_name", "rating", "text", "language", "timestamp"],
+                column_rows(reviews, REVIEW_COLUMNS), conflict=["review_id"])
+
+# map_chunk(df) -> (reviews frame, places frame); write_chunk(loader, reviews, places) stages the writes
+MapChunk = Callable[[pd.DataFrame], tuple[pd.DataFrame, pd.DataFrame]]
+WriteChunk = Callable[[BulkLoader, pd.DataFrame, pd.DataFrame], None]
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_checkpoint(conn, content_hash: str) -> tuple[int, bool]:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT rows_done, completed FROM ingest_checkpoint WHERE content_hash = %s", (content_hash,))
+        row = cursor.fetchone()
+    conn.commit()
+    return (row[0], row[1]) if row else (0, False)
+
+def write_checkpoint(conn, content_hash: str, file_path: str, rows_done: int, completed: bool) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO ingest_checkpoint (content_hash, file_path, rows_done, completed, updated_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (content_hash) DO UPDATE
+            SET file_path = EXCLUDED.file_path, rows_done = EXCLUDED.rows_done,
+                completed = EXCLUDED.completed, updated_at = EXCLUDED.updated_at;
+            """,
+            (content_hash, os.path.abspath(file_path), rows_done, completed)
+        )
+
+def stream_ingest(file_path: str, map_chunk: MapChunk, write_chunk: WriteChunk, chunk_size: int = 10_000,
+                  skip_existing: bool = True) -> int:
+    content_hash = file_hash(file_path)
+    with get_postgres_pool().connection() as conn:
+        rows_done, completed = read_checkpoint(conn, content_hash)
+        if completed:
+            print(f"{file_path} was already ingested ({rows_done} rows), nothing to do")
+            return rows_done
+        if rows_done:
+            print(f"Resuming {file_path} after row {rows_done}")
+        loader = BulkLoader(conn, batch_size=chunk_size, transaction="load")
+        prefilter = ExistingReviewFilter(conn) if skip_existing else None
+        # Data rows already committed are skipped; row 0 is the header
+        chunks = pd.read_csv(file_path, chunksize=chunk_size, skiprows=range(1, rows_done + 1))
+        for chunk in chunks:
+            try:
+                reviews, places = map_chunk(chunk)
+                if prefilter is not None:
+                    reviews = reviews[prefilter.new_mask(reviews["review_id"].tolist())]
+                write_chunk(loader, reviews, places)
+                rows_done += len(chunk)
+                write_checkpoint(conn, content_hash, file_path, rows_done, completed=False)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            if prefilter is not None:
+                prefilter.add(reviews["review_id"].tolist())
+            print(f"Committed rows up to {rows_done}")
+        write_checkpoint(conn, content_hash, file_path, rows_done, completed=True)
+        conn.commit()
+        if prefilter is not None:
+            print(f"Prefilter: {prefilter.stats()}")
+        return rows_done
@@ -0,0 +1,116 @@
+import re
+import json
+import hashlib
+from collections import Counter
+from resources import get_table
+
+## Precomputed pieces of SemanticDeduplicator._calculate_aspect_score.
+## 1. Keyword counting: instead of one re.findall per keyword, the keywords of a category are compiled into
+##    as few alternation patterns as possible. Keywords whose matches could overlap (one word-bounded inside
+##    another) go to separate patterns, so every keyword is counted exactly as its own findall would.
+## 2. Hypernym mapping: for every noun surface form WordNet knows (lemmas, irregular plurals and regular
+##    inflections), `python resources.py build` records which categories have a keyword among the names
+##    of its hypernym ancestors. At runtime the WordNet walk becomes one table lookup.
+## The table stores a fingerprint of CATEGORY_ASPECTS; if the keywords change, the lookup falls back to
+## walking WordNet until the resources are rebuilt.
+
+# Suffix rules WordNet's morphy applies to nouns: surface ending -> lemma ending
+NOUN_SUBSTITUTIONS = [("s", ""), ("ses", "s"), ("xes", "x"), ("zes", "z"), ("ches", "ch"), ("shes", "sh"), ("men", "man"), ("ies", "y")]
+
+def aspect_fingerprint(category_aspects: dict[str, list[str]]) -> str:
+    return hashlib.sha1(json.dumps(category_aspects, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+# Could word-bounded matches of `a` and `b` share a character in some text?
+def _can_overlap(a: str, b: str) -> bool:
+    for shift in range(-len(b) + 1, len(a)): # start of b relative to the start of a
+        merged = dict(enumerate(a))
+        if any(merged.setdefault(shift + i, c) != c for i, c in enumerate(b)):
+            continue
+        def boundary_ok(pos: int) -> bool:
+            left, right = merged.get(pos - 1), merged.get(pos)
+            return left is None or right is None or _is_word_char(left) != _is_word_char(right)
+        if all(boundary_ok(pos) for pos in (0, len(a), shift, shift + len(b))):
+            return True
+    return False
+
+class KeywordMatcher:
+    def __init__(self, keywords: list[str]):
+        self.multiplicity = Counter(keywords) # a keyword listed twice counts its matches twice
+        groups: list[list[str]] = []
+        for kw in sorted(self.multiplicity, key=len, reverse=True):
+            for group in groups:
+                if not any(_can_overlap(kw, other) for other in group):
+                    group.append(kw)
+                    break
+            else:
+                groups.append([kw])
+        self.patterns = [re.compile(r'\b(' + '|'.join(map(re.escape, group)) + r')\b') for group in groups]
+
+    # Returns the matched keywords and the total number of mentions
+    def match(self, text_lower: str) -> tuple[set[str], int]:
+        found, mentions = set(), 0
+        for pattern in self.patterns:
+            for m in pattern.finditer(text_lower):
+                kw = m.group(1)
+                found.add(kw)
+                mentions += self.multiplicity[kw]
+        return found, mentions
+
+def _synset_categories(synset, category_keywords: dict[str, set[str]]) -> set[str]:
+    ancestors = {ancestor.name().split('.')[0] for path in synset.hypernym_paths() for ancestor in path}
+    return {category for category, keywords in category_keywords.items() if ancestors & keywords}
+
+# Offline step: surface form -> comma-separated categories, for every noun form that maps to at least one
+def build_noun_aspect_table(category_aspects: dict[str, list[str]]) -> dict[str, str]:
+    from nltk.corpus import wordnet
+    category_keywords = {category: set(keywords) for category, keywords in category_aspects.items()}
+    lemmas = set(wordnet.all_lemma_names(pos='n'))
+    forms = set(lemmas)
+    for lemma in lemmas:
+        for surface, base in NOUN_SUBSTITUTIONS:
+            if lemma.endswith(base):
+                forms.add(lemma[:len(lemma) - len(base)] + surface)
+    forms.update(wordnet._exception_map['n'])
+    by_synset: dict[str, set[str]] = {}
+    table = {}
+    for form in forms:
+        categories = set()
+        for synset in wordnet.synsets(form, pos='n'):
+            if synset.name() not in by_synset:
+                by_synset[synset.name()] = _synset_categories(synset, category_keywords)
+            categories |= by_synset[synset.name()]
+        if categories:
+            table[form] = ",".join(sorted(categories))
+    return table
+
+class NounAspectLookup:
+    def __init__(self, category_aspects: dict[str, list[str]]):
+        self.category_aspects = category_aspects
+        self._keyword_sets = {category: set(keywords) for category, keywords in category_aspects.items()}
+        self._table = None
+        meta = get_table("meta")
+        if meta is not None and meta.get("aspects_fingerprint") == aspect_fingerprint(category_aspects):
+            self._table = get_table("noun_aspects")
+
+    @property
+    def precomputed(self) -> bool:
+        return self._table is not None
+
+    def maps_to(self, noun: str, category: str) -> bool:
+        if self._table is not None:
+            categories = self._table.get(noun)
+            return categories is not None and category in categories.split(",")
+        return self._walk_wordnet(noun, category)
+
+    # Original zero-shot mapping: does any hypernym of the noun name one of the category keywords?
+    def _walk_wordnet(self, noun: str, category: str) -> bool:
+        from textblob import Word
+        keywords = self._keyword_sets[category]
+        for syn in Word(noun).get_synsets(pos='n'):
+            for path in syn.hypernym_paths():
+                if any(ancestor.name().split('.')[0] in keywords for ancestor in path):
+                    return True
+        return False
@@ -0,0 +1,293 @@
+import os
+import sqlite3
+import numpy as np
+from minhash_signatures import MinHashSignatures, SignatureLSH, estimate_jaccard
+from overlap_index import required_overlap
+
+## Persistent near-duplicate index, partitioned by place_id.
+## For every stored review it keeps the MinHash signature, its LSH band buckets and its word postings,
+## so a new review is checked against a place's history without rebuilding anything:
+##   - MinHash candidates come from the band buckets and are verified with the estimated Jaccard similarity
+##   - overlap-coefficient matches (shorter subsets) come from the word postings with prefix filtering, as in
+##     OverlapIndex: the new review's tokens are probed rarest first, and past its prefix only the postings of
+##     stored reviews small enough to still reach the threshold are read (postings are ordered by review size),
+##     so frequent words cost little however long the place history is. Candidates are verified exactly.
+## Work per new review depends on the buckets and postings it touches, not on the number of stored reviews
+## being re-hashed. Reviews can be removed again, e.g. when they are deleted from the review table.
+## Two interchangeable stores: SQLite on local disk, or any Redis-compatible client (redis-py API).
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+# Probing the tokens of a review of `size` tokens rarest first, a stored review first seen at position i shares
+# at most size - i of them. Per position: None when a stored review of any size can still match, otherwise the
+# largest stored size that can (0: nothing new can match, stop probing).
+def probe_size_bounds(size: int, threshold: float) -> list[int | None]:
+    needed = required_overlap(size, threshold)
+    bounds = []
+    for i in range(size):
+        remaining = size - i
+        if needed <= remaining:
+            bounds.append(None)
+            continue
+        smaller = size - 1
+        while smaller > 0 and required_overlap(smaller, threshold) > remaining:
+            smaller -= 1
+        bounds.append(smaller)
+    return bounds
+
+def _is_overlap_match(shared: int, size: int, query_size: int, threshold: float) -> bool:
+    return shared / min(size, query_size) > threshold
+
+class SQLiteDedupStore:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                place_id TEXT, review_id TEXT, signature BLOB NOT NULL, size INTEGER NOT NULL,
+                PRIMARY KEY (place_id, review_id)
+            );
+            CREATE TABLE IF NOT EXISTS bands (place_id TEXT, band INTEGER, bucket BLOB, review_id TEXT);
+            CREATE INDEX IF NOT EXISTS bands_lookup ON bands (place_id, band, bucket);
+            CREATE INDEX IF NOT EXISTS bands_review ON bands (place_id, review_id);
+            CREATE TABLE IF NOT EXISTS postings (
+                place_id TEXT, token TEXT, size INTEGER, review_id TEXT, PRIMARY KEY (place_id, token, size, review_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_review ON postings (place_id, review_id);
+            CREATE TABLE IF NOT EXISTS token_counts (
+                place_id TEXT, token TEXT, count INTEGER NOT NULL, PRIMARY KEY (place_id, token)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def add(self, place_id: str, review_id: str, signature: bytes, band_keys: list[bytes], tokens: set[str]) -> None:
+        self.remove(place_id, review_id) # re-adding a review replaces it
+        self.conn.execute(
+            "INSERT OR REPLACE INTO reviews (place_id, review_id, signature, size) VALUES (?, ?, ?, ?)",
+            (place_id, review_id, signature, len(tokens))
+        )
+        self.conn.executemany(
+            "INSERT INTO bands (place_id, band, bucket, review_id) VALUES (?, ?, ?, ?)",
+            [(place_id, band, key, review_id) for band, key in enumerate(band_keys)]
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO postings (place_id, token, size, review_id) VALUES (?, ?, ?, ?)",
+            [(place_id, token, len(tokens), review_id) for token in tokens]
+        )
+        self.conn.executemany(
+            "INSERT INTO token_counts (place_id, token, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (place_id, token) DO UPDATE SET count = count + 1",
+            [(place_id, token) for token in tokens]
+        )
+
+    def remove(self, place_id: str, review_id: str) -> None:
+        tokens = self.conn.execute("SELECT token FROM postings WHERE place_id = ? AND review_id = ?", (place_id, review_id)).fetchall()
+        self.conn.executemany("UPDATE token_counts SET count = count - 1 WHERE place_id = ? AND token = ?", [(place_id, token) for (token,) in tokens])
+        self.conn.execute("DELETE FROM token_counts WHERE place_id = ? AND count <= 0", (place_id,))
+        for table in ("reviews", "bands", "postings"):
+            self.conn.execute(f"DELETE FROM {table} WHERE place_id = ? AND review_id = ?", (place_id, review_id))
+
+    def band_candidates(self, place_id: str, band_keys: list[bytes]) -> set[str]:
+        found = set()
+        for band, key in enumerate(band_keys):
+            rows = self.conn.execute(
+                "SELECT review_id FROM bands WHERE place_id = ? AND band = ? AND bucket = ?", (place_id, band, key)
+            )
+            found.update(review_id for (review_id,) in rows)
+        return found
+
+    def signatures(self, place_id: str, review_ids: list[str]) -> dict[str, bytes]:
+        if not review_ids:
+            return {}
+        marks = ",".join("?" * len(review_ids))
+        rows = self.conn.execute(
+            f"SELECT review_id, signature FROM reviews WHERE place_id = ? AND review_id IN ({marks})",
+            (place_id, *review_ids)
+        )
+        return dict(rows)
+
+    # Stored reviews sharing more than threshold * min(size) words with `tokens`
+    def overlap_matches(self, place_id: str, tokens: set[str], threshold: float) -> list[str]:
+        if not tokens:
+            return []
+        marks = ",".join("?" * len(tokens))
+        counts = dict(self.conn.execute(
+            f"SELECT token, count FROM token_counts WHERE place_id = ? AND token IN ({marks})", (place_id, *tokens)
+        ))
+        # Tokens the place has never seen are the rarest of all and share nothing: they take the first positions
+        ordered = sorted(counts, key=lambda token: (counts[token], token))
+        bounds = probe_size_bounds(len(tokens), threshold)[len(tokens) - len(ordered):]
+        candidates = set()
+        for token, bound in zip(ordered, bounds):
+            if bound == 0:
+                break
+            if bound is None:
+                rows = self.conn.execute("SELECT review_id FROM postings WHERE place_id = ? AND token = ?", (place_id, token))
+            else:
+                rows = self.conn.execute(
+                    "SELECT review_id FROM postings WHERE place_id = ? AND token = ? AND size <= ?", (place_id, token, bound)
+                )
+            candidates.update(review_id for (review_id,) in rows)
+        # Exact shared-token counts, read through the candidates' own postings
+        matches = []
+        candidates = sorted(candidates)
+        for start in range(0, len(candidates), 500):
+            batch = candidates[start:start + 500]
+            rows = self.conn.execute(
+                f"""
+                SELECT review_id, MAX(size), COUNT(*) FROM postings
+                WHERE place_id = ? AND review_id IN ({",".join("?" * len(batch))}) AND token IN ({marks})
+                GROUP BY review_id
+                """,
+                (place_id, *batch, *tokens)
+            )
+            matches += [review_id for review_id, size, shared in rows if _is_overlap_match(shared, size, len(tokens), threshold)]
+        return sorted(matches)
+
+    def count(self, place_id: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM reviews WHERE place_id = ?", (place_id,)).fetchone()[0]
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+class RedisDedupStore:
+    def __init__(self, client, prefix: str = "dedup"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, place_id: str, *parts) -> str:
+        return ":".join([self.prefix, place_id, *map(str, parts)])
+
+    def add(self, place_id: str, review_id: str, signature: bytes, band_keys: list[bytes], tokens: set[str]) -> None:
+        self.remove(place_id, review_id) # re-adding a review replaces it
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(place_id, "sig"), review_id, signature)
+        pipe.hset(self._key(place_id, "size"), review_id, len(tokens))
+        pipe.hset(self._key(place_id, "bands"), review_id, ",".join(key.hex() for key in band_keys))
+        pipe.hset(self._key(place_id, "tokens"), review_id, "\n".join(tokens))
+        for band, key in enumerate(band_keys):
+            pipe.sadd(self._key(place_id, "band", band, key.hex()), review_id)
+        for token in tokens:
+            pipe.zadd(self._key(place_id, "tok", token), {review_id: len(tokens)}) # scored by review size
+        pipe.execute()
+
+    def remove(self, place_id: str, review_id: str) -> None:
+        bands = self.client.hget(self._key(place_id, "bands"), review_id)
+        if bands is None:
+            return
+        tokens = _text(self.client.hget(self._key(place_id, "tokens"), review_id) or "")
+        pipe = self.client.pipeline()
+        for band, key in enumerate(_text(bands).split(",")):
+            pipe.srem(self._key(place_id, "band", band, key), review_id)
+        for token in filter(None, tokens.split("\n")):
+            pipe.zrem(self._key(place_id, "tok", token), review_id)
+        for field in ("sig", "size", "bands", "tokens"):
+            pipe.hdel(self._key(place_id, field), review_id)
+        pipe.execute()
+
+    def band_candidates(self, place_id: str, band_keys: list[bytes]) -> set[str]:
+        pipe = self.client.pipeline()
+        for band, key in enumerate(band_keys):
+            pipe.smembers(self._key(place_id, "band", band, key.hex()))
+        return {_text(m) for members in pipe.execute() for m in members}
+
+    def signatures(self, place_id: str, review_ids: list[str]) -> dict[str, bytes]:
+        if not review_ids:
+            return {}
+        values = self.client.hmget(self._key(place_id, "sig"), review_ids)
+        return {review_id: value for review_id, value in zip(review_ids, values) if value is not None}
+
+    def overlap_matches(self, place_id: str, tokens: set[str], threshold: float) -> list[str]:
+        if not tokens:
+            return []
+        ordered = list(tokens)
+        pipe = self.client.pipeline()
+        for token in ordered:
+            pipe.zcard(self._key(place_id, "tok", token))
+        counts = dict(zip(ordered, pipe.execute()))
+        ordered = sorted((token for token in ordered if counts[token]), key=lambda token: (counts[token], token))
+        bounds = probe_size_bounds(len(tokens), threshold)[len(tokens) - len(ordered):] # unseen tokens come first
+        pipe = self.client.pipeline()
+        for token, bound in zip(ordered, bounds):
+            if bound == 0:
+                break
+            pipe.zrangebyscore(self._key(place_id, "tok", token), "-inf", "+inf" if bound is None else bound)
+        candidates = sorted({_text(m) for members in pipe.execute() for m in members})
+        if not candidates:
+            return []
+        # Exact check against the candidates' stored token lists
+        pipe = self.client.pipeline()
+        pipe.hmget(self._key(place_id, "tokens"), candidates)
+        pipe.hmget(self._key(place_id, "size"), candidates)
+        stored_tokens, sizes = pipe.execute()
+        return [
+            review_id for review_id, stored, size in zip(candidates, stored_tokens, sizes)
+            if stored is not None and size is not None
+            and _is_overlap_match(len(tokens & set(_text(stored).split("\n"))), int(size), len(tokens), threshold)
+        ]
+
+    def count(self, place_id: str) -> int:
+        return self.client.hlen(self._key(place_id, "sig"))
+
+    def commit(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class PlaceDedupIndex:
+    def __init__(self, store, threshold: float = 0.85, num_perm: int = 128, k: int = 5, overlap_threshold: float = 0.85):
+        self.store = store
+        self.threshold = threshold
+        self.overlap_threshold = overlap_threshold
+        self.signatures = MinHashSignatures(num_perm=num_perm, k=k)
+        self.lsh = SignatureLSH(threshold=threshold, num_perm=num_perm)
+
+    # Check new reviews of one place against everything stored for it, then store them.
+    # Returns, for every new review id, the ids of stored (or earlier new) reviews it duplicates.
+    def check_and_insert(self, place_id: str, reviews: list[tuple[str, str]]) -> dict[str, list[str]]:
+        if not reviews:
+            return {}
+        signatures = self.signatures.compute([text for _, text in reviews])
+        band_keys = self.lsh.band_keys(signatures)
+        matches = {}
+        for i, (review_id, text) in enumerate(reviews):
+            keys = [band[i] for band in band_keys]
+            tokens = set(text.split())
+            candidates = sorted(self.store.band_candidates(place_id, keys) - {review_id})
+            stored = self.store.signatures(place_id, candidates)
+            duplicates = {
+                candidate for candidate, signature in stored.items()
+                if estimate_jaccard(signatures[i], np.frombuffer(signature, dtype=np.uint32)) >= self.threshold
+            }
+            duplicates.update(self.store.overlap_matches(place_id, tokens, self.overlap_threshold))
+            duplicates.discard(review_id)
+            matches[review_id] = sorted(duplicates)
+            # Inserted right away so later reviews of the same batch are checked against it
+            self.store.add(place_id, review_id, signatures[i].tobytes(), keys, tokens)
+        self.store.commit()
+        return matches
+
+    def remove(self, place_id: str, review_ids: list[str]) -> None:
+        for review_id in review_ids:
+            self.store.remove(place_id, review_id)
+        self.store.commit()
+
+    def count(self, place_id: str) -> int:
+        return self.store.count(place_id)
+
+# # Test script
+# index = PlaceDedupIndex(SQLiteDedupStore("data/cache/dedup_index.sqlite"))
+# print(index.check_and_insert("place-1", [("r1", "the ribeye was succulent and the server was so helpful.")]))
+# print(index.check_and_insert("place-1", [("r2", "the ribeye was succulent and the server was so helpful! amazing!")]))
+# index.remove("place-1", ["r1"])
+# print(index.count("place-1"))
@@ -0,0 +1,155 @@
+import os
+import time
+import atexit
+import sqlite3
+import weakref
+from collections import OrderedDict
+
+## Bounded key-value memo with LRU eviction, optionally backed by a SQLite file on local disk.
+## SQLite (in WAL mode) lets several worker processes share one cache file and keeps it across restarts.
+## Every process keeps a small in-memory front so repeated keys never touch the disk twice,
+## and writes are buffered and committed in batches to keep lock contention low.
+## Pinned entries are never evicted; they are used for values we know are permanent.
+## Writes still buffered when the interpreter exits are flushed by an atexit hook; call close() to flush earlier.
+
+_open_caches = weakref.WeakSet() # file-backed caches with a live connection, flushed at exit
+
+@atexit.register
+def _flush_open_caches() -> None:
+    for cache in list(_open_caches):
+        try:
+            cache.close()
+        except sqlite3.Error as e:
+            print(f"Could not flush {cache.path} at exit: {e}")
+
+class DiskLRUCache:
+    def __init__(self, path: str | None = None, capacity: int = 100_000, memory_capacity: int = 10_000, flush_every: int = 512):
+        self.path = path
+        self.capacity = capacity
+        self.memory_capacity = memory_capacity if path else capacity
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._pinned: dict[str, str] = {}
+        self._pending: dict[str, tuple[str, bool]] = {} # key -> (value, pinned), not yet written to disk
+        self._touched: set[str] = set() # keys read from disk whose recency must be refreshed
+        self._flushed_hits = 0
+        self._flushed_misses = 0
+        self._conn = self._connect(path) if path else None
+        if self._conn is not None:
+            _open_caches.add(self)
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL, pinned INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (pinned, last_used)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        return conn
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        if key in self._pinned:
+            self.hits += 1
+            return self._pinned[key]
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if key in self._pending:
+            self.hits += 1
+            return self._pending[key][0]
+        if self._conn is not None:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self._remember(key, row[0])
+                self._touched.add(key)
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: str, pinned: bool = False) -> None:
+        if pinned and self._conn is None:
+            self._pinned[key] = value
+            self._memory.pop(key, None)
+            return
+        self._remember(key, value)
+        if self._conn is not None:
+            self._pending[key] = (value, pinned)
+            if len(self._pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        if self._conn is None:
+            return
+        now = time.time_ns()
+        hits, misses = self.hits - self._flushed_hits, self.misses - self._flushed_misses
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT INTO entries (key, value, last_used, pinned) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, last_used = excluded.last_used, "
+                "pinned = MAX(entries.pinned, excluded.pinned)",
+                [(key, value, now, int(pinned)) for key, (value, pinned) in self._pending.items()]
+            )
+            self._conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in self._touched])
+            self._conn.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                [("hits", hits), ("misses", misses)]
+            )
+            self._evict()
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._pending.clear()
+        self._touched.clear()
+        self._flushed_hits, self._flushed_misses = self.hits, self.misses
+
+    # Drop the least recently used unpinned entries once the file grows past its capacity
+    def _evict(self) -> None:
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM entries WHERE pinned = 0").fetchone()
+        if size > self.capacity:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries WHERE pinned = 0 ORDER BY last_used LIMIT ?)",
+                (size - self.capacity,)
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        result = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._memory) + len(self._pinned)
+        }
+        if self._conn is not None:
+            self.flush()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            total = counters.get("hits", 0) + counters.get("misses", 0)
+            result["size"] = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            result["total_hits"] = counters.get("hits", 0)
+            result["total_misses"] = counters.get("misses", 0)
+            result["total_hit_rate"] = counters.get("hits", 0) / total if total else 0.0
+        return result
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+            _open_caches.discard(self)
@@ -0,0 +1,172 @@
+import os
+import json
+import sqlite3
+import hashlib
+import unicodedata
+import numpy as np
+from embedding_dedup import Embedder
+
+## Content-addressed store of text embeddings, keyed by (model id, hash of the normalized text).
+## Identical texts (repeated reviews, boilerplate website paragraphs, re-ingested pages) are embedded once
+## per model and served from disk afterwards, across runs and worker processes.
+## Layout: one directory per model under the cache root, holding
+##   vectors.f32   - append-only float32 rows, read through a read-only memory map (pages shared by processes)
+##   index.sqlite  - text hash -> row number (SQLite in WAL mode, batched IN lookups)
+##   model.json    - model id and dimension, checked on open
+## Writers reserve rows and write the vectors inside one SQLite write transaction, and the vectors are
+## fsync'ed before the index rows are committed, so no committed row points at a vector lost in a crash.
+## Texts are normalized (NFKC, collapsed whitespace) before hashing, and the normalized text is what gets
+## embedded, so every text sharing a key really shares its vector.
+
+LOOKUP_BATCH = 900 # stays below SQLite's bound parameter limit
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def text_key(normalized: str) -> bytes:
+    return hashlib.sha256(normalized.encode("utf-8")).digest()[:16]
+
+class EmbeddingCache:
+    def __init__(self, root: str, model_id: str, dim: int):
+        self.model_id = model_id
+        self.dim = dim
+        self.path = os.path.join(root, hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16])
+        os.makedirs(self.path, exist_ok=True)
+        self._check_model()
+        self._row_bytes = dim * 4
+        self._data_path = os.path.join(self.path, "vectors.f32")
+        self._fd = os.open(self._data_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._conn = sqlite3.connect(os.path.join(self.path, "index.sqlite"), timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, row INTEGER NOT NULL) WITHOUT ROWID")
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+
+    def _check_model(self) -> None:
+        meta_path = os.path.join(self.path, "model.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta != {"model_id": self.model_id, "dim": self.dim}:
+                raise ValueError(f"{self.path} holds embeddings of {meta}, not {self.model_id!r} with dim {self.dim}")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"model_id": self.model_id, "dim": self.dim}, f)
+
+    # Memory map over every complete row; remapped when other writers have appended past its end
+    def _rows(self, needed: int) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) < needed:
+            count = os.fstat(self._fd).st_size // self._row_bytes
+            self._vectors = np.memmap(self._data_path, dtype=np.float32, mode="r", shape=(count, self.dim)) if count else np.zeros((0, self.dim), dtype=np.float32)
+        return self._vectors
+
+    def _lookup_rows(self, keys: list[bytes]) -> dict[bytes, int]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[start:start + LOOKUP_BATCH]
+            rows = self._conn.execute(f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch)
+            found.update(rows)
+        return found
+
+    # Returns (vectors, found): rows of texts not in the cache are zero and found[i] is False
+    def get_many(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        return self.get_many_keys([text_key(normalize_text(text)) for text in texts])
+
+    # Same as get_many, for callers that already hold the text_key() of every text
+    def get_many_keys(self, keys: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+        rows = self._lookup_rows(keys)
+        found = np.array([key in rows for key in keys], dtype=bool)
+        vectors = np.zeros((len(keys), self.dim), dtype=np.float32)
+        if found.any():
+            positions = np.array([rows[key] for key, hit in zip(keys, found) if hit], dtype=np.int64)
+            vectors[found] = self._rows(int(positions.max()) + 1)[positions]
+        self.hits += int(found.sum())
+        self.misses += int(len(keys) - found.sum())
+        return vectors, found
+
+    # Stores vectors for texts whose key is not stored yet (another process may have added some meanwhile)
+    def put_many(self, texts: list[str], vectors: np.ndarray) -> int:
+        return self.put_many_keys([text_key(normalize_text(text)) for text in texts], vectors)
+
+    def put_many_keys(self, keys: list[bytes], vectors: np.ndarray) -> int:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(keys), self.dim):
+            raise ValueError(f"Expected vectors of shape {(len(keys), self.dim)}, got {vectors.shape}")
+        pending = {}
+        for key, vector in zip(keys, vectors):
+            pending.setdefault(key, vector)
+        if not pending:
+            return 0
+        self._conn.execute("BEGIN IMMEDIATE") # one writer at a time reserves rows at the end of the file
+        try:
+            stored = self._lookup_rows(list(pending))
+            new = [(key, vector) for key, vector in pending.items() if key not in stored]
+            if new:
+                first = os.fstat(self._fd).st_size // self._row_bytes # a torn tail from a crash is overwritten
+                os.pwrite(self._fd, np.stack([vector for _, vector in new]).tobytes(), first * self._row_bytes)
+                os.fsync(self._fd) # vectors are durable before the rows pointing at them are committed
+                self._conn.executemany("INSERT INTO entries (key, row) VALUES (?, ?)", [(key, first + i) for i, (key, _) in enumerate(new)])
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return len(new)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        (size,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0, "size": size}
+
+    def close(self) -> None:
+        self._vectors = None
+        self._conn.close()
+        os.close(self._fd)
+
+# Any Embedder with a model_id, consulting the cache before encoding. Only distinct texts missing from
+# the cache reach the wrapped model, and their vectors are stored for the next call or run.
+class CachedEmbedder(Embedder):
+    def __init__(self, embedder: Embedder, cache_root: str):
+        if not embedder.model_id:
+            raise ValueError(f"{type(embedder).__name__} has no model_id; it is needed to key the cache")
+        self.embedder = embedder
+        self.cache_root = cache_root
+        self.dim = embedder.dim
+        self.model_id = embedder.model_id
+        self.cache = EmbeddingCache(cache_root, embedder.model_id, embedder.dim)
+
+    # Pickled (e.g. into pool workers) without the open files; the copy reopens the same cache
+    def __getstate__(self) -> dict:
+        return {"embedder": self.embedder, "cache_root": self.cache_root}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["embedder"], state["cache_root"])
+
+    # Every text is normalized and hashed once; the keys are passed straight to the cache
+    def embed(self, texts: list[str]) -> np.ndarray:
+        normalized = [normalize_text(text) for text in texts]
+        keys = [text_key(text) for text in normalized]
+        vectors, found = self.cache.get_many_keys(keys)
+        missing = {key: text for key, text, hit in zip(keys, normalized, found) if not hit} # distinct keys, first-seen order
+        if missing:
+            computed = np.asarray(self.embedder.embed(list(missing.values())), dtype=np.float32)
+            self.cache.put_many_keys(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            for i in np.flatnonzero(~found):
+                vectors[i] = by_key[keys[i]]
+        return vectors
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def close(self) -> None:
+        self.cache.close()
+
+# # Test script
+# from embedding_dedup import HashingEmbedder
+# embedder = CachedEmbedder(HashingEmbedder(), "data/cache/embeddings")
+# embedder.embed(["The pizza was great!", "The  pizza was great!", "Friendly staff."])
+# embedder.embed(["The pizza was great!", "Friendly staff."])
+# print(embedder.stats())
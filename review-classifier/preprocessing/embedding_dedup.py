@@ -0,0 +1,132 @@
+import hashlib
+from abc import ABC, abstractmethod
+import numpy as np
+
+## Semantic near-duplicate detection over review embeddings (768-d, like semantic_embedding in
+## schema/qdrant/review_feature.json). Catches paraphrased copies that character shingles miss.
+##   - Embedder: pluggable text -> unit vector model. HashingEmbedder is deterministic and needs no
+##     model download, for offline runs and tests; a real model only has to implement embed() and set
+##     model_id. embedding_cache_path wraps it in a CachedEmbedder (see embedding_cache.py).
+##   - IVFIndex: in-process approximate nearest-neighbour index. Vectors are assigned to k-means cells
+##     (about sqrt(n) of them); a query scans only the n_probe closest cells, so the work per query grows
+##     with sqrt(n) instead of n. Candidates are verified with the exact cosine similarity.
+
+EMBEDDING_DIM = 768
+
+class Embedder(ABC):
+    dim = EMBEDDING_DIM
+    model_id: str | None = None # names the model and its settings; keys the embedding cache (embedding_cache.py)
+
+    # Returns a (len(texts), dim) float32 matrix of L2-normalized rows
+    @abstractmethod
+    def embed(self, texts: list[str]) -> np.ndarray:
+        ...
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+# Signed feature hashing of word unigrams, word bigrams and character trigrams.
+# Uses blake2b rather than hash() so vectors are identical across processes and runs.
+class HashingEmbedder(Embedder):
+    def __init__(self, dim: int = EMBEDDING_DIM, char_ngram: int = 3):
+        self.dim = dim
+        self.char_ngram = char_ngram
+        self.model_id = f"hashing-v1:dim={dim}:char_ngram={char_ngram}"
+        self._buckets: dict[str, tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        if feature not in self._buckets:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            self._buckets[feature] = (h % self.dim, 1.0 if (h >> 63) & 1 else -1.0)
+        return self._buckets[feature]
+
+    def _features(self, text: str) -> list[str]:
+        words = text.lower().split()
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        n = self.char_ngram
+        for w in words:
+            padded = f" {w} "
+            features += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+        return features
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                column, sign = self._bucket(feature)
+                vectors[row, column] += sign
+        return normalize_rows(vectors)
+
+class IVFIndex:
+    def __init__(self, vectors: np.ndarray, n_lists: int | None = None, n_probe: int = 8, iterations: int = 10, seed: int = 0):
+        self.vectors = normalize_rows(vectors)
+        n = len(self.vectors)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = min(n_probe, self.n_lists)
+        self.centroids = self._train(iterations, np.random.RandomState(seed))
+        assignment = self._nearest_centroid(self.vectors)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.n_lists)]
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    # Spherical k-means; empty cells are re-seeded from random vectors
+    def _train(self, iterations: int, gen: np.random.RandomState) -> np.ndarray:
+        centroids = self.vectors[gen.choice(len(self.vectors), self.n_lists, replace=False)] if len(self.vectors) else np.zeros((1, self.vectors.shape[1]), dtype=np.float32)
+        for _ in range(iterations if len(self.vectors) > self.n_lists else 0):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            empty = ~sums.any(axis=1)
+            sums[empty] = self.vectors[gen.choice(len(self.vectors), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        return centroids
+
+    # For every query row, the indexed rows with cosine similarity >= threshold (excluding exclude[i])
+    def range_search(self, queries: np.ndarray, threshold: float, exclude: list[int] | None = None) -> list[list[int]]:
+        queries = normalize_rows(queries)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.n_probe]
+        results = []
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[c] for c in probes[i]])
+            similarity = self.vectors[candidates] @ query
+            found = candidates[similarity >= threshold]
+            if exclude is not None:
+                found = found[found != exclude[i]]
+            results.append(sorted(found.tolist()))
+        return results
+
+class EmbeddingDeduplicator:
+    # embedding_cache_path: directory of an EmbeddingCache shared across runs and processes
+    def __init__(self, embedder: Embedder | None = None, threshold: float = 0.92, n_probe: int = 8,
+                 embedding_cache_path: str | None = None):
+        self.embedder = embedder or HashingEmbedder()
+        if embedding_cache_path is not None:
+            from embedding_cache import CachedEmbedder
+            self.embedder = CachedEmbedder(self.embedder, embedding_cache_path)
+        self.threshold = threshold
+        self.n_probe = n_probe
+
+    # Pairs (i, j), i < j, whose embeddings have cosine similarity >= threshold.
+    # Pass precomputed vectors (e.g. stored semantic_embedding values) to skip the embedder.
+    def near_duplicate_pairs(self, texts: list[str], vectors: np.ndarray | None = None) -> list[tuple[int, int]]:
+        if vectors is None:
+            vectors = self.embedder.embed(texts)
+        if len(vectors) < 2:
+            return []
+        index = IVFIndex(vectors, n_probe=self.n_probe)
+        neighbours = index.range_search(index.vectors, self.threshold, exclude=list(range(len(vectors))))
+        return [(i, j) for i, found in enumerate(neighbours) for j in found if i < j]
+
+# # Test script
+# dedup = EmbeddingDeduplicator(threshold=0.8)
+# print(dedup.near_duplicate_pairs([
+#     "We went to Marmaris with my wife for a holiday and chose this restaurant for dinner.",
+#     "My wife and I went to Marmaris for a holiday and chose this restaurant for dinner.",
+#     "The latte art was beautiful and the pastries were fresh.",
+# ]))
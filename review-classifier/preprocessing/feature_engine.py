@@ -0,0 +1,228 @@
+import os
+import re
+from itertools import islice
+from multiprocessing import Pool
+from typing import Callable, Iterable, Iterator
+import numpy as np
+import pandas as pd
+from aspect_lookup import KeywordMatcher, NounAspectLookup
+from semantic_deduplicator import CATEGORY_ASPECTS
+
+## Batch feature extraction for review_feature_store / ReviewFeature.
+## Every review is tokenized and POS-tagged exactly once; all features of a chunk are then derived from
+## that shared pass with NumPy, over the flattened tokens of the whole chunk (one owner index per token):
+##   token_count        - word tokens (punctuation and emoji excluded)
+##   entropy_score      - Shannon entropy (bits) of the lowercased word distribution
+##   repetition_score   - 1 - distinct words / word tokens
+##   pos_diversity      - entropy of the coarse POS class distribution, normalized to 0..1
+##   noun_verb_ratio    - nouns / max(verbs, 1)
+##   exclamation_count  - "!" characters in the text
+##   emoji_count        - emoji in the text
+##   sentiment_polarity - TextBlob's pattern lexicon polarity, scored on the same tokens
+##   coverage_score     - aspects mentioned / aspects the review could mention, where the aspects are the
+##                        category's keywords plus the tagged nouns of the review that map to the category
+##                        (as in the aspect score); NULL for unknown categories
+## Chunks run on a process pool whose workers load the tagger and lexicons once.
+## The result is a DataFrame in FEATURE_STORE_COLUMNS order; feature_rows() feeds it to BulkLoader.load.
+## grounding_score is not computed here: it needs the place context, so it is left to the RAG stage and
+## these writes never touch it.
+
+# PTB-style tokens, as the tagger was trained on: "didn't" -> "did", "n't"
+TOKEN_PATTERN = re.compile(r"\w+(?=n't\b)|n't\b|'(?:s|re|ve|ll|d|m)\b|\w+|[^\w\s]", re.IGNORECASE)
+
+POS_CLASSES = ["NOUN", "VERB", "ADJ", "ADV", "PRON", "DET", "ADP", "NUM", "CONJ", "PRT", "OTHER"]
+NOUN, VERB, OTHER = POS_CLASSES.index("NOUN"), POS_CLASSES.index("VERB"), POS_CLASSES.index("OTHER")
+# Penn Treebank tag (or its prefix) -> coarse class
+TAG_CLASSES = {
+    "NN": "NOUN", "VB": "VERB", "MD": "VERB", "JJ": "ADJ", "RB": "ADV", "WRB": "ADV", "PRP": "PRON", "WP": "PRON",
+    "EX": "PRON", "DT": "DET", "PDT": "DET", "WDT": "DET", "IN": "ADP", "CD": "NUM", "CC": "CONJ", "RP": "PRT",
+    "TO": "PRT", "POS": "PRT"
+}
+
+FEATURE_COLUMNS = [
+    "pos_diversity", "noun_verb_ratio", "coverage_score", "token_count", "entropy_score",
+    "exclamation_count", "emoji_count", "sentiment_polarity", "repetition_score"
+]
+FEATURE_STORE_COLUMNS = ["review_id", "place_id", *FEATURE_COLUMNS, "rating", "text_chunk", "language", "source", "timestamp"]
+
+# tagger(token lists) -> tag lists
+Tagger = Callable[[list[list[str]]], list[list[str]]]
+
+# NLTK's averaged perceptron, the model behind TextBlob's tags (needs averaged_perceptron_tagger_eng)
+def nltk_tagger() -> Tagger:
+    from nltk.tag import PerceptronTagger
+    tagger = PerceptronTagger()
+    return lambda sentences: [[tag for _, tag in tagged] for tagged in tagger.tag_sents(sentences)]
+
+# Words and clitics ("n't", "'s"); a bare apostrophe is punctuation
+def _is_word(token: str) -> bool:
+    return token[0].isalnum() or token[0] == "_" or (token[0] == "'" and any(c.isalnum() for c in token))
+
+# Entropy (bits) and number of distinct codes per row, for (row, code) items of all rows at once
+def _grouped_entropy(rows: np.ndarray, codes: np.ndarray, totals: np.ndarray, width: int) -> tuple[np.ndarray, np.ndarray]:
+    pairs, counts = np.unique(rows * width + codes, return_counts=True)
+    pair_rows = pairs // width
+    p = counts / totals[pair_rows]
+    entropy = 0.0 - np.bincount(pair_rows, weights=p * np.log2(p), minlength=len(totals)) # 0.0 - keeps empty rows at +0.0
+    return entropy, np.bincount(pair_rows, minlength=len(totals))
+
+# Each pool worker keeps one warm engine (tagger, lexicons) for its whole lifetime
+_worker_engine = None
+
+def _init_worker(engine_kwargs: dict) -> None:
+    global _worker_engine
+    _worker_engine = FeatureEngine(**engine_kwargs)
+
+def _extract_chunk_in_worker(items: list[tuple[str, str | None]]) -> dict[str, np.ndarray]:
+    return _worker_engine._extract_chunk(items)
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+class FeatureEngine:
+    # tagger_factory is called once per process; it must be a module-level function to reach pool workers
+    def __init__(self, tagger_factory: Callable[[], Tagger] = nltk_tagger):
+        self._init_kwargs = {"tagger_factory": tagger_factory}
+        self._tagger_factory = tagger_factory
+        self._tagger = None
+        self._sentiment = None
+        self._emoji = None
+        self._tag_classes: dict[str, int] = {}
+        self._matchers: dict[str, KeywordMatcher] = {}
+        self._noun_lookup = None
+
+    def _load(self) -> None:
+        if self._tagger is None:
+            from textblob.en import sentiment
+            import emoji
+            self._tagger = self._tagger_factory()
+            self._sentiment = sentiment
+            self._emoji = emoji
+            self._noun_lookup = NounAspectLookup(CATEGORY_ASPECTS)
+
+    def _tag_class(self, tag: str) -> int:
+        if tag not in self._tag_classes:
+            for prefix in (tag, tag[:3], tag[:2]):
+                if prefix in TAG_CLASSES:
+                    self._tag_classes[tag] = POS_CLASSES.index(TAG_CLASSES[prefix])
+                    break
+            else:
+                self._tag_classes[tag] = OTHER
+        return self._tag_classes[tag]
+
+    def _matcher(self, category: str) -> KeywordMatcher:
+        if category not in self._matchers:
+            self._matchers[category] = KeywordMatcher(CATEGORY_ASPECTS[category])
+        return self._matchers[category]
+
+    def _coverage(self, text: str, category: str | None, tagged_nouns: list[str], mapped: dict[tuple[str, str], bool]) -> float:
+        if category not in CATEGORY_ASPECTS:
+            return np.nan
+        keywords = set(CATEGORY_ASPECTS[category])
+        found, _ = self._matcher(category).match(text.lower())
+        mapped_nouns = set()
+        for noun in tagged_nouns:
+            if noun not in keywords:
+                key = (noun, category)
+                if key not in mapped:
+                    mapped[key] = self._noun_lookup.maps_to(noun, category)
+                if mapped[key]:
+                    mapped_nouns.add(noun)
+        # Mapped nouns count in the numerator and the denominator alike, so the score stays a share
+        return (len(found) + len(mapped_nouns)) / (len(keywords) + len(mapped_nouns))
+
+    # items: (text, category or None). Returns one array per feature column.
+    def _extract_chunk(self, items: list[tuple[str, str | None]]) -> dict[str, np.ndarray]:
+        self._load()
+        n = len(items)
+        texts = [text or "" for text, _ in items]
+        tokens = [TOKEN_PATTERN.findall(text) for text in texts]
+        tags = self._tagger(tokens) # the one tagging pass every POS feature and the coverage nouns come from
+
+        words, word_rows, classes = [], [], []
+        sentiment = np.zeros(n)
+        coverage = np.full(n, np.nan)
+        mapped: dict[tuple[str, str], bool] = {}
+        for i, (review_tokens, review_tags) in enumerate(zip(tokens, tags)):
+            lowered = [token.lower() for token in review_tokens]
+            sentiment[i] = self._sentiment(lowered)[0]
+            nouns = []
+            for token, tag in zip(lowered, review_tags):
+                if _is_word(token):
+                    words.append(token)
+                    word_rows.append(i)
+                    classes.append(self._tag_class(tag))
+                    if tag in ("NN", "NNS"):
+                        nouns.append(token)
+            coverage[i] = self._coverage(texts[i], items[i][1], nouns, mapped)
+
+        rows = np.asarray(word_rows, dtype=np.int64)
+        classes = np.asarray(classes, dtype=np.int64)
+        codes, vocabulary = pd.factorize(pd.Series(words, dtype=object))
+        token_count = np.bincount(rows, minlength=n)
+        safe_count = np.maximum(token_count, 1)
+        entropy, distinct = _grouped_entropy(rows, codes.astype(np.int64), safe_count, max(len(vocabulary), 1))
+        pos_entropy, _ = _grouped_entropy(rows, classes, safe_count, len(POS_CLASSES))
+        class_counts = np.bincount(rows * len(POS_CLASSES) + classes, minlength=n * len(POS_CLASSES)).reshape(n, len(POS_CLASSES))
+        return {
+            "pos_diversity": pos_entropy / np.log2(len(POS_CLASSES)),
+            "noun_verb_ratio": class_counts[:, NOUN] / np.maximum(class_counts[:, VERB], 1),
+            "coverage_score": coverage,
+            "token_count": token_count,
+            "entropy_score": entropy,
+            "exclamation_count": np.fromiter((text.count("!") for text in texts), dtype=np.int64, count=n),
+            "emoji_count": np.fromiter((0 if text.isascii() else self._emoji.emoji_count(text) for text in texts), dtype=np.int64, count=n),
+            "sentiment_polarity": sentiment,
+            "repetition_score": np.where(token_count > 0, 1.0 - distinct / safe_count, 0.0),
+        }
+
+    # Features for every text, in input order, as a DataFrame with FEATURE_COLUMNS.
+    # categories (e.g. place.category) enable coverage_score; with workers > 1 chunks go to a process pool.
+    def extract_batch(self, texts: Iterable[str], categories: Iterable[str | None] | None = None,
+                      workers: int | None = 1, chunk_size: int = 1000) -> pd.DataFrame:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        items = zip(texts, categories) if categories is not None else ((text, None) for text in texts)
+        if workers <= 1:
+            parts = [self._extract_chunk(chunk) for chunk in _chunked(items, chunk_size)]
+        else:
+            pool = Pool(processes=workers, initializer=_init_worker, initargs=(self._init_kwargs,))
+            try:
+                parts = list(pool.imap(_extract_chunk_in_worker, _chunked(items, chunk_size)))
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        if not parts:
+            return pd.DataFrame({column: [] for column in FEATURE_COLUMNS})
+        return pd.DataFrame({column: np.concatenate([part[column] for part in parts]) for column in FEATURE_COLUMNS})
+
+    # reviews: one row per review with review_id, place_id, rating, text_chunk, language and timestamp
+    # (plus category to score coverage). Returns the review_feature_store rows in FEATURE_STORE_COLUMNS order.
+    def build_feature_store(self, reviews: pd.DataFrame, source: str, workers: int | None = 1, chunk_size: int = 1000) -> pd.DataFrame:
+        categories = reviews["category"].tolist() if "category" in reviews else None
+        features = self.extract_batch(reviews["text_chunk"].tolist(), categories, workers=workers, chunk_size=chunk_size)
+        frame = reviews[["review_id", "place_id", "rating", "text_chunk", "language", "timestamp"]].reset_index(drop=True)
+        frame = pd.concat([frame, features], axis=1)
+        frame["source"] = source
+        return frame[FEATURE_STORE_COLUMNS]
+
+# Row tuples for BulkLoader.load; NaN and NaT become NULL
+def feature_rows(frame: pd.DataFrame, columns: list[str] = FEATURE_STORE_COLUMNS) -> Iterator[tuple]:
+    values = [frame[column].astype(object).where(frame[column].notna(), None).tolist() for column in columns]
+    return zip(*values)
+
+# # Test script
+# engine = FeatureEngine()
+# print(engine.extract_batch(["The pizza was great!! 🍕🔥", "The service was slow and the food was cold."], ["restaurant", None]))
+# from schema.bulk_loader import BulkLoader
+# from schema.connect_db import get_postgres_pool
+# with get_postgres_pool().connection() as conn:
+#     reviews = pd.read_sql("SELECT r.*, r.text AS text_chunk, p.category FROM review r JOIN place p USING (place_id)", conn)
+# frame = engine.build_feature_store(reviews, source="kaggle", workers=4)
+# with get_postgres_pool().connection() as conn, BulkLoader(conn) as loader:
+#     loader.load("review_feature_store", FEATURE_STORE_COLUMNS, feature_rows(frame), conflict=["review_id"], update=FEATURE_COLUMNS)
@@ -0,0 +1,96 @@
+import re
+import hashlib
+from disk_cache import DiskLRUCache
+from resources import get_vocabulary
+
+## Language identification on the raw review text (before any cleaning strips accents or emojis).
+## Plain-ASCII text whose words are mostly in the English dictionary is labelled "en" without running
+## langid at all; everything else is classified by langid once and memoized by content hash.
+## update_review_languages() fills review.language in bulk so later stages can filter on it.
+
+NON_ASCII_LETTER_PATTERN = re.compile(r'(?![\x00-\x7f])[^\W\d_]') # accented or non-Latin letters, not emojis
+WORD_PATTERN = re.compile(r'[a-z]+')
+UNDETERMINED = "und"
+
+class LanguageDetector:
+    def __init__(self, cache_path: str | None = None, cache_size: int = 500_000, vocabulary=None,
+                 english_ratio: float = 0.8, min_words: int = 3, sample_words: int = 20):
+        self.cache = DiskLRUCache(path=cache_path, capacity=cache_size)
+        self._vocabulary = vocabulary
+        self.english_ratio = english_ratio
+        self.min_words = min_words
+        self.sample_words = sample_words
+        self.fast_path_hits = 0
+
+    @property
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = get_vocabulary()
+        return self._vocabulary
+
+    # Cheap check for obviously-English text: no non-ASCII letters and mostly dictionary words
+    def _is_plain_english(self, text: str) -> bool:
+        if NON_ASCII_LETTER_PATTERN.search(text):
+            return False
+        words = WORD_PATTERN.findall(text.lower())[:self.sample_words]
+        if len(words) < self.min_words:
+            return False
+        known = sum(1 for w in words if w in self.vocabulary)
+        return known >= self.english_ratio * len(words)
+
+    def detect(self, text: str) -> str:
+        if not text or not text.strip():
+            return UNDETERMINED
+        if self._is_plain_english(text):
+            self.fast_path_hits += 1
+            return "en"
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        lang = self.cache.get(key)
+        if lang is None:
+            import langid
+            lang, _ = langid.classify(text)
+            self.cache.put(key, lang)
+        return lang
+
+    def detect_batch(self, texts: list[str]) -> list[str]:
+        languages = [self.detect(text) for text in texts]
+        self.cache.flush()
+        return languages
+
+    def stats(self) -> dict:
+        return {"fast_path_hits": self.fast_path_hits, **self.cache.stats()}
+
+# Detect and store the language of every review that does not have one yet
+def update_review_languages(conn, detector: LanguageDetector, batch_size: int = 5000) -> int:
+    from psycopg2.extras import execute_values
+    read_cursor = conn.cursor(name="review_language_scan", withhold=True) # server-side, survives the commits below
+    read_cursor.itersize = batch_size
+    read_cursor.execute("SELECT review_id, text FROM review WHERE language IS NULL OR language = ''")
+    write_cursor = conn.cursor()
+    updated = 0
+    try:
+        while rows := read_cursor.fetchmany(batch_size):
+            languages = detector.detect_batch([text or "" for _, text in rows])
+            execute_values(
+                write_cursor,
+                """
+                UPDATE review AS r SET language = v.language
+                FROM (VALUES %s) AS v(review_id, language)
+                WHERE r.review_id = v.review_id::uuid;
+                """,
+                [(str(review_id), lang) for (review_id, _), lang in zip(rows, languages)],
+                page_size=batch_size
+            )
+            conn.commit()
+            updated += len(rows)
+    finally:
+        write_cursor.close()
+        read_cursor.close()
+    return updated
+
+if __name__ == "__main__":
+    from schema.connect_db import get_postgres_pool
+    detector = LanguageDetector(cache_path="data/cache/languages.sqlite")
+    with get_postgres_pool().connection() as conn:
+        print(f"Updated language for {update_review_languages(conn, detector)} reviews")
+    print(detector.stats())
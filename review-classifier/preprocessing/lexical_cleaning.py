@@ -1,55 +1,115 @@
 import re
-import langid
-import nltk
-import asyncio
-from googletrans import Translator
-from textblob import Word
-import emoji
+import os
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator
+from resources import get_vocabulary
+from spell_cache import SpellCorrectionCache
+from translation import TranslationStage, TranslationMemory, TranslatorBackend
+from language_detection import LanguageDetector
 
-# One-time download of the dictionary
-nltk.download('words', quiet=True)
-from nltk.corpus import words as nltk_words
+# emoji and TextBlob are imported by the steps that use them, so importing this module stays cheap.
+# The dictionary comes from the memory-mapped resources file (see resources.py).
+
+# Patterns are compiled once per process instead of on every clean() call
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+HTML_TAG_PATTERN = re.compile(r'<.*?>')
+ELONGATION_PATTERN = re.compile(r'(.)\1{2,}')
+EMOJI_ALIAS_PATTERN = re.compile(r':([a-z_]+):')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+REPEATED_PUNCT_PATTERN = re.compile(r'([!?.]){2,}')
+PREFIX_PATTERN = re.compile(r'^\W*')
+SUFFIX_PATTERN = re.compile(r'.*?(\W*)$')
+
+# Each pool worker keeps one warm cleaner (vocabulary, translator) for its whole lifetime
+_worker_cleaner = None
+
+def _init_worker(cleaner_kwargs: dict) -> None:
+    global _worker_cleaner
+    _worker_cleaner = LexicalCleaner(**cleaner_kwargs)
+
+def _clean_chunk_in_worker(items: list[tuple[str, str | None]]) -> list[str]:
+    return _worker_cleaner._clean_chunk(items)
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
 
 class LexicalCleaner:
-    def __init__(self):
-        self.translator = Translator()
-        self.vocabulary = set(w.lower() for w in nltk_words.words())
-    
-    async def translate(self, text: str) -> str:
-        result = await self.translator.translate(text, dest="en")
-        return result.text
-
-    def clean(self, text: str) -> str:
+    def __init__(
+        self,
+        spell_cache_path: str | None = None,
+        spell_cache_size: int = 200_000,
+        translator_backend: TranslatorBackend | None = None,
+        translation_memory_path: str | None = None,
+        translation_concurrency: int = 4,
+        language_cache_path: str | None = None
+    ):
+        # Kept so pool workers can build an identical cleaner sharing the same cache files
+        self._init_kwargs = {
+            "spell_cache_path": spell_cache_path,
+            "spell_cache_size": spell_cache_size,
+            "translator_backend": translator_backend,
+            "translation_memory_path": translation_memory_path,
+            "translation_concurrency": translation_concurrency,
+            "language_cache_path": language_cache_path
+        }
+        self.vocabulary = get_vocabulary()
+        self.spell_cache = SpellCorrectionCache(path=spell_cache_path, capacity=spell_cache_size)
+        self.translation = TranslationStage(
+            backend=translator_backend,
+            memory=TranslationMemory(path=translation_memory_path),
+            max_concurrency=translation_concurrency
+        )
+        self.language_detector = LanguageDetector(cache_path=language_cache_path, vocabulary=self.vocabulary)
+
+    # Flushes every cache file; pending writes are also flushed at interpreter exit if close() is never called
+    def close(self) -> None:
+        self.spell_cache.close()
+        self.language_detector.cache.close()
+        self.translation.memory.close()
+
+    async def translate(self, text: str, src: str = "auto") -> str:
+        return (await self.translation.translate_async([text], [src]))[0]
+
+    # Pass the stored review.language when it is known to skip detection
+    def clean(self, text: str, language: str | None = None) -> str:
         if not text:
             return ""
+        lang = language or self.language_detector.detect(text)
+        text = self._normalize(text)
+        text = self.translation.translate([text], [lang])[0]
+        return self._correct_spelling(self._to_ascii(text))
+
+    def _normalize(self, text: str) -> str:
+        import emoji
         text = text.lower() # normalize lowercase
         # Remove URLs and HTML tags if any
-        text = re.sub(r'https?://\S+|www\.\S+', '', text) 
-        text = re.sub(r'<.*?>', '', text)
+        text = URL_PATTERN.sub('', text)
+        text = HTML_TAG_PATTERN.sub('', text)
         # De-elongation of characters to maximum 2 similar neighboring characters
-        text = re.sub(r'(.)\1{2,}', r'\1\1', text)
+        text = ELONGATION_PATTERN.sub(r'\1\1', text)
         # Emoji verbalization
         text = emoji.demojize(text)
-        text = re.sub(r':([a-z_]+):', r'[\1] ', text)
+        text = EMOJI_ALIAS_PATTERN.sub(r'[\1] ', text)
         text = text.replace("_", " ")
         # Strip excessive whitespace and repeated punctuations
-        text = re.sub(r'\s+', ' ', text).strip()
-        text = re.sub(r'([!?.]){2,}', r'\1', text) # ??? -> ?
-        # Clean unicode junks and malformed characters
-        text = text.encode("ascii", "ignore").decode()
-        # Language detection and translation using langid and google translate
-        try:
-            lang, _ = langid.classify(text)
-            if lang != "en":
-                text = asyncio.run(self.translate_text(text))
-        except Exception:
-            pass
-        # Spelling correction using N-gram language model (TextBlob)
+        text = WHITESPACE_PATTERN.sub(' ', text).strip()
+        text = REPEATED_PUNCT_PATTERN.sub(r'\1', text) # ??? -> ?
+        return text
+
+    # Clean unicode junks and malformed characters; done after translation so the translator sees the accents
+    def _to_ascii(self, text: str) -> str:
+        return text.encode("ascii", "ignore").decode()
+
+    # Spelling correction using N-gram language model (TextBlob)
+    def _correct_spelling(self, text: str) -> str:
         words = text.split()
         corrected_words = []
         for w in words:
-            prefix = re.match(r'^\W*', w).group()
-            suffix = re.match(r'.*?(\W*)$', w).group(1)
+            prefix = PREFIX_PATTERN.match(w).group()
+            suffix = SUFFIX_PATTERN.match(w).group(1)
             core = w[len(prefix):len(w)-len(suffix)]
             if not core:
                 if w.startswith('[') and w.endswith(']'):
@@ -58,22 +118,65 @@ class LexicalCleaner:
             if core in self.vocabulary:
                 corrected_words.append(w)
                 continue
-            word_obj = Word(core)
-            suggestions = word_obj.spellcheck()
-            best_guess, confidence = suggestions[0]
-            if confidence > 0.7:
-                corrected_words.append(prefix + best_guess + suffix)
-            else:
-                corrected_words.append(w)
+            corrected_words.append(prefix + self._correct(core) + suffix)
         text = " ".join([w for w in corrected_words if w])
-        return re.sub(r'\s+', ' ', text).strip()
+        return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    # Spellcheck decisions are memoized; a word TextBlob is unsure about maps to itself
+    def _correct(self, core: str) -> str:
+        cached = self.spell_cache.get(core)
+        if cached is not None:
+            return cached
+        from textblob import Word
+        best_guess, confidence = Word(core).spellcheck()[0]
+        correction = best_guess if confidence > 0.7 else core
+        self.spell_cache.put(core, correction)
+        return correction
+
+    # Normalize the whole chunk, translate its non-English texts in one concurrent run, then spellcheck
+    def _clean_chunk(self, items: list[tuple[str, str | None]]) -> list[str]:
+        # Languages are detected on the raw text, before normalization strips accents
+        languages = [language or self.language_detector.detect(text) if text else "en" for text, language in items]
+        normalized = [self._normalize(text) if text else "" for text, _ in items]
+        translated = self.translation.translate(normalized, languages)
+        cleaned = [self._correct_spelling(self._to_ascii(text)) if text else "" for text in translated]
+        self.spell_cache.flush() # make new corrections visible to the other workers
+        self.language_detector.cache.flush()
+        return cleaned
+
+    # Stream cleaned texts in input order; with workers > 1 the chunks are spread over a process pool
+    # whose workers each build their own LexicalCleaner once and reuse it for every chunk.
+    # `languages` (e.g. review.language from the database) skips detection for rows where it is set.
+    def clean_batch(self, texts: Iterable[str], workers: int | None = 1, chunk_size: int = 256,
+                    languages: Iterable[str | None] | None = None) -> Iterator[str]:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        items = zip(texts, languages) if languages is not None else ((text, None) for text in texts)
+        if workers <= 1:
+            for chunk in _chunked(items, chunk_size):
+                yield from self._clean_chunk(chunk)
+            return
+        pool = Pool(processes=workers, initializer=_init_worker, initargs=(self._init_kwargs,))
+        try:
+            for cleaned in pool.imap(_clean_chunk_in_worker, _chunked(items, chunk_size)):
+                yield from cleaned
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
 
 # # Test script
-# cleaner = LexicalCleaner()
+# cleaner = LexicalCleaner(spell_cache_path="data/cache/spell_corrections.sqlite", translation_memory_path="data/cache/translations.sqlite")
 # print(cleaner.clean("The pizza was greattt!! 🍕🔥"))
 # print(cleaner.clean("Sooo happppyyyy!!! 😄🎉"))
 # print(cleaner.clean("Check this out: https://example.com <b>amazing</b>!!"))
 # print(cleaner.clean("La pizza était délicieuse 🍕"))
+# print(cleaner.clean("La pizza était délicieuse 🍕", language="fr"))
 # print(cleaner.clean("Ths sentnce has speling erors."))
 # print(cleaner.clean("He is not happy with this product."))
-# print(cleaner.clean("Wait..... what???   Really!!!"))
\ No newline at end of file
+# print(cleaner.clean("Wait..... what???   Really!!!"))
+# print(list(cleaner.clean_batch(["Sooo happppyyyy!!! 😄🎉", "Ths sentnce has speling erors."], workers=2)))
+# print(cleaner.spell_cache.stats())
+# cleaner.close()
\ No newline at end of file
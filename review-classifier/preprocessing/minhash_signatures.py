@@ -0,0 +1,129 @@
+import numpy as np
+from functools import lru_cache
+from collections import defaultdict
+
+## Vectorized MinHash over character k-shingles.
+## All texts of a batch are concatenated into one array of code points; the k-shingle hashes are computed
+## for every position at once with a polynomial rolling hash, and the permutations are applied block-wise,
+## reducing each text's rows with np.minimum.reduceat. The output is a (n_texts, num_perm) uint32 matrix:
+## 4 * num_perm bytes per review, cheap to store with np.save/tobytes and to feed to SignatureLSH.
+
+MAX_HASH = np.uint32(0xFFFFFFFF)
+POLY_BASE = np.uint64(0x100000001B3) # FNV prime; arithmetic wraps modulo 2^64
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, spreads the polynomial hash over all 64 bits
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class MinHashSignatures:
+    def __init__(self, num_perm: int = 128, k: int = 5, seed: int = 1, block_size: int = 32_768):
+        self.num_perm = num_perm
+        self.k = k
+        self.block_size = block_size # shingles per permutation block; bounds the temporary matrix
+        gen = np.random.RandomState(seed)
+        # Affine permutations h -> a * h + b mod 2^64 with odd a; the top 32 bits are kept
+        self._a = (gen.randint(0, 1 << 62, num_perm, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = gen.randint(0, 1 << 62, num_perm, dtype=np.uint64) << np.uint64(2)
+
+    # Hash of every k-shingle of every text, plus the row each shingle belongs to.
+    # Texts shorter than k contribute one shingle made of the whole text.
+    def _shingle_hashes(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        k = self.k
+        codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        hashes, rows = [], []
+        if len(codes) >= k:
+            n_windows = len(codes) - k + 1
+            h = np.zeros(n_windows, dtype=np.uint64)
+            for j in range(k):
+                h = h * POLY_BASE + codes[j:j + n_windows]
+            # Keep only windows that lie inside a single text
+            owner = np.repeat(np.arange(len(texts)), lengths)
+            valid = owner[:n_windows] == owner[k - 1:]
+            hashes.append(h[valid])
+            rows.append(owner[:n_windows][valid])
+        short = np.flatnonzero(lengths < k)
+        if len(short):
+            h = np.zeros(len(short), dtype=np.uint64)
+            for j in range(k - 1):
+                has_char = lengths[short] > j
+                idx = np.minimum(starts[short] + j, max(len(codes) - 1, 0))
+                chars = codes[idx] if len(codes) else np.zeros(len(short), dtype=np.uint64)
+                h = np.where(has_char, h * POLY_BASE + chars, h)
+            hashes.append(h + lengths[short].astype(np.uint64)) # distinguishes "" from "\0"
+            rows.append(short)
+        if not hashes:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+        hashes, rows = np.concatenate(hashes), np.concatenate(rows)
+        order = np.argsort(rows, kind="stable")
+        return _mix64(hashes[order]), rows[order]
+
+    def compute(self, texts: list[str]) -> np.ndarray:
+        signatures = np.full((len(texts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        if not texts:
+            return signatures
+        hashes, rows = self._shingle_hashes(texts)
+        for start in range(0, len(hashes), self.block_size):
+            h = hashes[start:start + self.block_size]
+            r = rows[start:start + self.block_size]
+            permuted = ((h[:, None] * self._a + self._b) >> np.uint64(32)).astype(np.uint32)
+            boundaries = np.flatnonzero(np.concatenate(([True], r[1:] != r[:-1])))
+            block_rows = r[boundaries]
+            mins = np.minimum.reduceat(permuted, boundaries, axis=0)
+            signatures[block_rows] = np.minimum(signatures[block_rows], mins)
+        return signatures
+
+def estimate_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.count_nonzero(a == b)) / len(a)
+
+# Same (bands, rows) choice as datasketch's MinHashLSH: minimize the false positive and false negative
+# areas below and above the threshold, weighted equally.
+@lru_cache(maxsize=None)
+def optimal_lsh_params(threshold: float, num_perm: int, steps: int = 1000) -> tuple[int, int]:
+    def area(y: np.ndarray, x: np.ndarray) -> float:
+        return float(((y[:-1] + y[1:]) * np.diff(x)).sum() / 2)
+    below = np.linspace(0.0, threshold, steps)
+    above = np.linspace(threshold, 1.0, steps)
+    best, best_error = (1, num_perm), float("inf")
+    for b in range(1, num_perm + 1):
+        for r in range(1, num_perm // b + 1):
+            false_positive = area(1 - (1 - below ** r) ** b, below)
+            false_negative = area((1 - above ** r) ** b, above)
+            error = 0.5 * false_positive + 0.5 * false_negative
+            if error < best_error:
+                best, best_error = (b, r), error
+    return best
+
+# Banded LSH over signature matrices; two rows are candidates if any band is identical
+class SignatureLSH:
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128):
+        self.b, self.r = optimal_lsh_params(threshold, num_perm)
+        self._buckets: list[dict[bytes, list]] = [defaultdict(list) for _ in range(self.b)]
+
+    def band_keys(self, signatures: np.ndarray) -> list[list[bytes]]:
+        bands = []
+        for band in range(self.b):
+            block = np.ascontiguousarray(signatures[:, band * self.r:(band + 1) * self.r])
+            bands.append([row.tobytes() for row in block])
+        return bands
+
+    def insert_many(self, keys: list, signatures: np.ndarray) -> None:
+        for band, band_keys in enumerate(self.band_keys(signatures)):
+            buckets = self._buckets[band]
+            for key, band_key in zip(keys, band_keys):
+                buckets[band_key].append(key)
+
+    # Candidate keys for every row of `signatures`
+    def query_many(self, signatures: np.ndarray) -> list[list]:
+        found = [dict() for _ in range(len(signatures))]
+        for band, band_keys in enumerate(self.band_keys(signatures)):
+            buckets = self._buckets[band]
+            for i, band_key in enumerate(band_keys):
+                for key in buckets.get(band_key, ()):
+                    found[i][key] = None
+        return [list(keys) for keys in found]
@@ -0,0 +1,59 @@
+from collections import Counter, defaultdict
+
+## Inverted token index answering "which reviews have an overlap coefficient above t with review i?"
+## overlap(A, B) = |A and B| / min(|A|, |B|) over the sets of whitespace tokens, as in SemanticDeduplicator.
+## Uses prefix filtering: with tokens ordered from rarest to most frequent, if the smaller set S must share
+## more than t * |S| tokens, then at least one of its first |S| - needed + 1 tokens is shared.
+## So only those prefix tokens are probed, which keeps candidate lists short, and every candidate
+## is verified exactly, so the result is identical to comparing all pairs.
+
+def required_overlap(size: int, threshold: float) -> int:
+    # Smallest c with c / size > threshold, using the same float comparison as the exact check
+    c = int(threshold * size)
+    while c <= size and c / size <= threshold:
+        c += 1
+    while c > 0 and (c - 1) / size > threshold:
+        c -= 1
+    return c
+
+def overlap_coefficient(a: set, b: set) -> float:
+    shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+    if not shorter:
+        return 0.0
+    return len(shorter & longer) / len(shorter)
+
+class OverlapIndex:
+    def __init__(self, token_sets: list[set], threshold: float):
+        self.token_sets = token_sets
+        self.threshold = threshold
+        self._neighbours: list[list[int]] = [[] for _ in token_sets]
+        self._self_join()
+
+    def _prefix_length(self, size: int) -> int:
+        needed = required_overlap(size, self.threshold)
+        return size - needed + 1 if 0 < needed <= size else 0
+
+    # Visit reviews from largest to smallest token set. When a set is visited, every set already in the
+    # index is at least as large, so it is the smaller side of those pairs and only its prefix needs probing.
+    # Each matching pair is found and verified exactly once.
+    def _self_join(self) -> None:
+        frequency = Counter(token for tokens in self.token_sets for token in tokens)
+        index: dict[str, list[int]] = defaultdict(list) # token -> visited reviews containing it
+        for i in sorted(range(len(self.token_sets)), key=lambda i: -len(self.token_sets[i])):
+            tokens = self.token_sets[i]
+            if not tokens:
+                continue
+            prefix = sorted(tokens, key=lambda token: (frequency[token], token))[:self._prefix_length(len(tokens))]
+            candidates = {j for token in prefix for j in index.get(token, ())}
+            for j in candidates:
+                if len(tokens & self.token_sets[j]) / len(tokens) > self.threshold:
+                    self._neighbours[i].append(j)
+                    self._neighbours[j].append(i)
+            for token in tokens:
+                index[token].append(i)
+
+    # Indices j (including i itself) with overlap(i, j) > threshold, in ascending order
+    def query(self, i: int) -> list[int]:
+        if not self.token_sets[i]:
+            return []
+        return sorted(self._neighbours[i] + ([i] if self.threshold < 1.0 else []))
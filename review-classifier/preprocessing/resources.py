@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import mmap
+import zlib
+import struct
+import argparse
+from array import array
+from typing import Iterable, Iterator
+
+## Precompiled NLP lexicons shared by the preprocessing stages.
+## `python resources.py build` downloads the NLTK data once and writes every lexicon into a single
+## binary file of sorted string tables. At runtime the file is memory-mapped read-only, so any number
+## of worker processes share the same physical pages, and lookups probe a hash index stored in the file:
+## opening a table costs nothing and no process keeps its own copy of a lexicon.
+## Nothing here touches the network unless the build step is run explicitly.
+##
+## File layout (little-endian):
+##   MAGIC | uint32 header length | JSON header {"tables": {name: {"offset", "count", "slots", "index"}}} | tables...
+##   table = uint32[count + 1] entry offsets | entries, each "key" or "key\0value" in UTF-8, sorted by key
+##           | (at "index" bytes from the table start) uint32[slots] key crc32 | uint32[slots] entry number + 1
+##   The index is an open-addressing table (linear probing, at most half full, 0 = empty slot); a crc32 hit
+##   is confirmed by comparing the key bytes. Tables of files built without an index are binary searched.
+
+MAGIC = b"OQFRES01"
+RESOURCES_PATH = os.getenv(
+    "NLP_RESOURCES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources", "nlp_resources.bin")
+)
+NLTK_PACKAGES = ["words", "punkt_tab", "averaged_perceptron_tagger_eng", "wordnet"]
+
+class StringTable:
+    def __init__(self, buffer: mmap.mmap, offset: int, count: int, slots: int = 0, index: int | None = None):
+        self._buffer = buffer
+        self._count = count
+        self._offsets = memoryview(buffer)[offset:offset + 4 * (count + 1)].cast("I")
+        self._base = offset + 4 * (count + 1)
+        self._mask = slots - 1
+        if slots:
+            start = offset + index
+            self._hashes = memoryview(buffer)[start:start + 4 * slots].cast("I")
+            self._slot_entries = memoryview(buffer)[start + 4 * slots:start + 8 * slots].cast("I")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, i: int) -> bytes:
+        return self._buffer[self._base + self._offsets[i]:self._base + self._offsets[i + 1]]
+
+    def _find(self, key: str) -> bytes | None:
+        target = key.encode("utf-8")
+        if self._mask < 0:
+            return self._bisect(target)
+        size = len(target)
+        h = zlib.crc32(target)
+        slot = h & self._mask
+        while True:
+            entry_number = self._slot_entries[slot]
+            if not entry_number:
+                return None
+            if self._hashes[slot] == h:
+                entry = self._entry(entry_number - 1)
+                if entry[:size] == target and (len(entry) == size or entry[size] == 0):
+                    return entry
+            slot = (slot + 1) & self._mask
+
+    def _bisect(self, target: bytes) -> bytes | None:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            entry_key = entry.split(b"\0", 1)[0]
+            if entry_key < target:
+                lo = mid + 1
+            elif entry_key > target:
+                hi = mid
+            else:
+                return entry
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        entry = self._find(key)
+        if entry is None:
+            return default
+        parts = entry.split(b"\0", 1)
+        return parts[1].decode("utf-8") if len(parts) > 1 else ""
+
+    def keys(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self._entry(i).split(b"\0", 1)[0].decode("utf-8")
+
+class ResourceFile:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an NLP resources file")
+        (header_len,) = struct.unpack_from("<I", self._buffer, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._buffer[start:start + header_len])
+        self._tables: dict[str, StringTable] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header["tables"]
+
+    def table(self, name: str) -> StringTable:
+        if name not in self._tables:
+            meta = self.header["tables"][name]
+            self._tables[name] = StringTable(self._buffer, meta["offset"], meta["count"], meta.get("slots", 0), meta.get("index"))
+        return self._tables[name]
+
+# Open-addressing index over the sorted keys: a power of two of slots, at least twice the key count
+def _hash_index(keys: list[bytes]) -> tuple[int, array, array]:
+    slots = 1
+    while slots < 2 * len(keys):
+        slots *= 2
+    hashes, slot_entries = array("I", bytes(4 * slots)), array("I", bytes(4 * slots))
+    for i, key in enumerate(keys):
+        h = zlib.crc32(key)
+        slot = h & (slots - 1)
+        while slot_entries[slot]:
+            slot = (slot + 1) & (slots - 1)
+        hashes[slot], slot_entries[slot] = h, i + 1
+    if sys.byteorder != "little":
+        hashes.byteswap()
+        slot_entries.byteswap()
+    return slots, hashes, slot_entries
+
+# Each table is either a set of keys or a key -> value mapping
+def write_resources(path: str, tables: dict[str, Iterable[str] | dict[str, str]]) -> None:
+    encoded = {}
+    for name, table in tables.items():
+        items = table.items() if isinstance(table, dict) else ((key, None) for key in table)
+        entries = sorted(
+            (key.encode("utf-8"), None if value is None else value.encode("utf-8"))
+            for key, value in items
+        )
+        offsets, blob, position = [0], bytearray(), 0
+        for key, value in entries:
+            entry = key if value is None else key + b"\0" + value
+            blob += entry
+            position += len(entry)
+            offsets.append(position)
+        data = struct.pack(f"<{len(offsets)}I", *offsets) + bytes(blob)
+        data += b"\0" * ((-len(data)) % 4)
+        slots, hashes, slot_entries = _hash_index([key for key, _ in entries])
+        encoded[name] = (len(entries), slots, len(data), data + hashes.tobytes() + slot_entries.tobytes())
+    # Offsets in the header are absolute; they depend on the header size, so iterate until it is stable
+    header_len = 0
+    while True:
+        position = len(MAGIC) + 4 + header_len
+        meta = {}
+        for name, (count, slots, index, data) in encoded.items():
+            position += (-position) % 4 # keep the uint32 offset arrays aligned
+            meta[name] = {"offset": position, "count": count, "slots": slots, "index": index}
+            position += len(data)
+        header = json.dumps({"tables": meta}).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", header_len) + header)
+        for name, (count, slots, index, data) in encoded.items():
+            f.write(b"\0" * (meta[name]["offset"] - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, path) # readers never see a half-written file
+
+def download_nltk_data() -> None:
+    import nltk
+    for package in NLTK_PACKAGES:
+        nltk.download(package, quiet=True)
+
+def build_resources(path: str = RESOURCES_PATH) -> None:
+    download_nltk_data()
+    from nltk.corpus import words as nltk_words
+    from semantic_deduplicator import CATEGORY_ASPECTS
+    from aspect_lookup import build_noun_aspect_table, aspect_fingerprint
+    tables = {
+        "vocabulary": set(w.lower() for w in nltk_words.words()),
+        "noun_aspects": build_noun_aspect_table(CATEGORY_ASPECTS),
+        "meta": {"aspects_fingerprint": aspect_fingerprint(CATEGORY_ASPECTS)}
+    }
+    write_resources(path, tables)
+    print(f"Wrote {', '.join(f'{name} ({len(t)})' for name, t in tables.items())} to {path}")
+
+_resources: dict[str, ResourceFile | None] = {}
+
+# Opened once per process; returns None when the file has not been built
+def load_resources(path: str = RESOURCES_PATH) -> ResourceFile | None:
+    if path not in _resources:
+        _resources[path] = ResourceFile(path) if os.path.exists(path) else None
+    return _resources[path]
+
+def get_table(name: str, path: str = RESOURCES_PATH) -> StringTable | None:
+    resources = load_resources(path)
+    if resources is None or name not in resources:
+        return None
+    return resources.table(name)
+
+def get_vocabulary(path: str = RESOURCES_PATH) -> StringTable | frozenset[str]:
+    vocabulary = get_table("vocabulary", path)
+    if vocabulary is not None:
+        return vocabulary
+    # Fall back to a locally installed NLTK corpus; never download at this point
+    from nltk.corpus import words as nltk_words
+    try:
+        print(f"[WARN] {path} not found, loading the NLTK word list. Run `python resources.py build` to speed this up.", file=sys.stderr)
+        return frozenset(w.lower() for w in nltk_words.words())
+    except LookupError as e:
+        raise LookupError("No vocabulary available: run `python resources.py build` once with network access.") from e
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the precompiled NLP resources file")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--output", default=RESOURCES_PATH)
+    args = parser.parse_args()
+    build_resources(args.output)
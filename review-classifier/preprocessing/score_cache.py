@@ -0,0 +1,23 @@
+import hashlib
+from disk_cache import DiskLRUCache
+
+## Memo of aspect scores computed by SemanticDeduplicator, keyed by (scorer version, category, text hash).
+## Keys hold a hash of the text instead of the text itself and nothing references the deduplicator,
+## so the cache stays small and can outlive the objects that filled it. Pass a path to share it
+## between worker processes and runs (SQLite, see DiskLRUCache); stats() reports the hit rate for sizing.
+## The version changes whenever the scorer or its keyword lists change, so stale scores are never served.
+
+class AspectScoreCache(DiskLRUCache):
+    def __init__(self, version: str, path: str | None = None, capacity: int = 500_000, **kwargs):
+        super().__init__(path=path, capacity=capacity, **kwargs)
+        self.version = version
+
+    def key(self, text: str, category: str) -> str:
+        return f"{self.version}:{category}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    def lookup(self, text: str, category: str) -> float | None:
+        value = self.get(self.key(text, category))
+        return float(value) if value is not None else None
+
+    def store(self, text: str, category: str, score: float) -> None:
+        self.put(self.key(text, category), repr(score))
@@ -1,13 +1,14 @@
-import re
-from functools import lru_cache
-from datasketch import MinHash, MinHashLSH
-from textblob import TextBlob, Word
+import numpy as np
+from typing import Hashable, Sequence
+from overlap_index import OverlapIndex, overlap_coefficient
+from minhash_signatures import MinHashSignatures, SignatureLSH
+from aspect_lookup import KeywordMatcher, NounAspectLookup, aspect_fingerprint
+from score_cache import AspectScoreCache
+from embedding_dedup import EmbeddingDeduplicator
 
-# One-time download the required setups for Blob
-import nltk
-nltk.download('punkt_tab') # handles sentence or word splitting
-nltk.download('averaged_perceptron_tagger_eng', quiet=True) # handles tags
-nltk.download('wordnet') # get hypernyms of word
+# TextBlob (tokenizer, tagger, WordNet) is imported by the steps that use it.
+# The NLTK data they need (punkt_tab, averaged_perceptron_tagger_eng, wordnet) is downloaded once by
+# `python resources.py build` instead of at import time.
 
 # All Google Maps categories can be found at https://pleper.com/index.php?do=tools&sdo=gmb_categories
 # We process only for common business categories.
@@ -76,98 +77,165 @@ CATEGORY_ASPECTS = {
 }
 
 OVERLAP_THRESHOLD = 0.85
+# Bump when _compute_aspect_score changes; cached scores of other versions are then ignored
+SCORER_VERSION = 2
+
+# Built on first use: compiled keyword patterns per category and the precomputed noun -> aspect table
+_keyword_matchers: dict[str, KeywordMatcher] = {}
+_noun_lookup: NounAspectLookup | None = None
+
+def _keyword_matcher(category: str) -> KeywordMatcher:
+    if category not in _keyword_matchers:
+        _keyword_matchers[category] = KeywordMatcher(CATEGORY_ASPECTS[category])
+    return _keyword_matchers[category]
+
+def _noun_aspect_lookup() -> NounAspectLookup:
+    global _noun_lookup
+    if _noun_lookup is None:
+        _noun_lookup = NounAspectLookup(CATEGORY_ASPECTS)
+    return _noun_lookup
+
+class DuplicateCluster:
+    def __init__(self, member_indices: list[int], member_ids: list[Hashable], representative_index: int,
+                 score: float, signatures: np.ndarray):
+        self.member_indices = member_indices # positions in the input list
+        self.member_ids = member_ids # caller ids, in the same order (the indices when no ids were given)
+        self.representative_index = representative_index
+        self.representative_id = member_ids[member_indices.index(representative_index)]
+        self.score = score # aspect score of the representative; clusters scoring 0 are dropped by deduplicate
+        self.signatures = signatures # MinHash signatures of the members, (n, num_perm) in member order
+        self._similarity: np.ndarray | None = None
+
+    # Estimated Jaccard similarity between members, (n, n) in member order. Computed on first call, one row at
+    # a time, so memory stays at the (n, n) result instead of an (n, n, num_perm) comparison cube.
+    def similarity(self) -> np.ndarray:
+        if self._similarity is None:
+            n, num_perm = self.signatures.shape
+            similarity = np.empty((n, n), dtype=np.float32)
+            for i in range(n):
+                similarity[i] = np.count_nonzero(self.signatures == self.signatures[i], axis=1) / num_perm
+            self._similarity = similarity
+        return self._similarity
+
+    @property
+    def kept(self) -> bool:
+        return self.score > 0
+
+    @property
+    def duplicate_ids(self) -> list[Hashable]:
+        return [review_id for review_id in self.member_ids if review_id != self.representative_id]
+
+    def __repr__(self) -> str:
+        return f"DuplicateCluster(representative={self.representative_id!r}, members={self.member_ids!r}, score={self.score})"
 
 class SemanticDeduplicator:
-    def __init__(self, threshold: int = 0.85, num_perm: int = 128, k: int = 5):
+    def __init__(self, threshold: int = 0.85, num_perm: int = 128, k: int = 5, score_cache_path: str | None = None, score_cache_size: int = 500_000,
+                 embedding_dedup: EmbeddingDeduplicator | None = None):
         self.threshold = threshold
         self.num_perm = num_perm
         self.k = k
+        self.signatures = MinHashSignatures(num_perm=num_perm, k=k)
+        self.score_cache = AspectScoreCache(
+            version=f"{SCORER_VERSION}.{aspect_fingerprint(CATEGORY_ASPECTS)[:12]}",
+            path=score_cache_path, capacity=score_cache_size
+        )
+        self.embedding_dedup = embedding_dedup # optional third pass catching paraphrased copies
 
-    def _get_shingles(self, text: str, k: int = 5): # creates k-gram shingles
-        if len(text) < k:
-            return {text}
-        return set(text[i:i+k] for i in range(len(text)-k+1))
-    
     def _word_overlap(self, a: str, b: str) -> float: # calculate Szymkiewicz–Simpson (or overlap) coefficient
-        word_a, word_b = set(a.split()), set(b.split())
-        shorter = word_a if len(word_a) <= len(word_b) else word_b
-        longer = word_a if len(word_a) > len(word_b) else word_b
-        if not shorter:
-            return 0.0
-        return len(shorter & longer) / len(shorter) # overlap(a,b) = len(A and B)/min(len(A), len(B))
+        return overlap_coefficient(set(a.split()), set(b.split())) # overlap(a,b) = len(A and B)/min(len(A), len(B))
     
-    @lru_cache(maxsize=2000)
     def _calculate_aspect_score(self, text: str, category: str) -> float:
+        score = self.score_cache.lookup(text, category)
+        if score is None:
+            score = self._compute_aspect_score(text, category)
+            self.score_cache.store(text, category, score)
+        return score
+
+    def _compute_aspect_score(self, text: str, category: str) -> float:
         if category not in CATEGORY_ASPECTS:
             return len(text.split()) * 0.1
+        from textblob import TextBlob
         blob = TextBlob(text)
-        text_lower = text.lower()
-        unique_aspects = set()
-        total_aspect_mentions = 0
-        keywords = CATEGORY_ASPECTS[category]
-        for kw in keywords: # explicit keyword matching
-            matches = re.findall(r'\b' + re.escape(kw) + r'\b', text_lower)
-            if matches:
-                unique_aspects.add(kw)
-                total_aspect_mentions += len(matches)
-        # POS Tagging; zero-shot hypernym mapping to the listed subcategories
+        # Explicit keyword matching in one compiled pass per category
+        unique_aspects, total_aspect_mentions = _keyword_matcher(category).match(text.lower())
+        # POS Tagging; zero-shot hypernym mapping to the listed subcategories (precomputed from WordNet)
+        noun_lookup = _noun_aspect_lookup()
         for word, pos in blob.tags:
             clean_word = word.lower()
             if pos in ['NN', 'NNS'] and clean_word not in unique_aspects:
-                synsets = Word(clean_word).get_synsets(pos='n')
-                mapped = False
-                for syn in synsets:
-                    for path in syn.hypernym_paths():
-                        for ancestor in path:
-                            ancestor_name = ancestor.name().split('.')[0]
-                            if ancestor_name in keywords:
-                                unique_aspects.add(clean_word)
-                                total_aspect_mentions += 1
-                                mapped = True
-                                break
-                        if mapped: break
-                    if mapped: break
+                if noun_lookup.maps_to(clean_word, category):
+                    unique_aspects.add(clean_word)
+                    total_aspect_mentions += 1
         score = len(unique_aspects) + (0.5 * total_aspect_mentions)
         return score
 
-    def deduplicate(self, reviews: list, category: str) -> list:
+    def deduplicate(self, reviews: list, category: str, embeddings: np.ndarray | None = None) -> list:
+        clusters = self.deduplicate_clusters(reviews, category, embeddings=embeddings)
+        return [reviews[cluster.representative_index] for cluster in clusters if cluster.kept]
+
+    # Merge clusters containing embedding near-duplicates of each other; keeps the order of first appearance
+    def _merge_semantic(self, clusters: list[list[int]], reviews: list, embeddings: np.ndarray | None) -> list[list[int]]:
+        owner = {idx: c for c, cluster in enumerate(clusters) for idx in cluster}
+        parent = list(range(len(clusters)))
+        def find(c: int) -> int:
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+        for i, j in self.embedding_dedup.near_duplicate_pairs(reviews, embeddings):
+            a, b = find(owner[i]), find(owner[j])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        merged: dict[int, list[int]] = {}
+        for c, cluster in enumerate(clusters):
+            merged.setdefault(find(c), []).extend(cluster)
+        return list(merged.values())
+
+    # Structured output: every cluster with its members, representative, score and (on demand) pairwise similarity.
+    # ids (e.g. review_id) are carried through so results can be written back without matching text.
+    def deduplicate_clusters(self, reviews: list, category: str, ids: Sequence[Hashable] | None = None,
+                             embeddings: np.ndarray | None = None) -> list[DuplicateCluster]:
         if not reviews:
             return []
-        lsh = MinHashLSH(threshold=self.threshold, num_perm=self.num_perm)
-        minhashes = {}
-        # Generate signatures and insert to LSH (locality sensitive hashing)
-        for i, text in enumerate(reviews):
-            m = MinHash(num_perm=self.num_perm)
-            for shingle in self._get_shingles(text, k=self.k):
-                m.update(shingle.encode('utf-8'))
-            lsh.insert(f"idx_{i}", m)
-            minhashes[i] = m
+        if ids is None:
+            ids = range(len(reviews))
+        elif len(ids) != len(reviews):
+            raise ValueError(f"Got {len(ids)} ids for {len(reviews)} reviews")
+        # Generate signatures for the whole batch at once and insert to LSH (locality sensitive hashing)
+        signatures = self.signatures.compute(reviews)
+        lsh = SignatureLSH(threshold=self.threshold, num_perm=self.num_perm)
+        lsh.insert_many(list(range(len(reviews))), signatures)
+        lsh_candidates = lsh.query_many(signatures)
         # Cluster duplicates or near-identical reviews
         ## IDEA: Jaccard (MinHash) looks at the total intersection over the total union
         ##       We need to also look at the intersection over the size of the smaller set using overlap coeff. 
         clusters = []
         visited = set()
+        overlap_index = OverlapIndex([set(text.split()) for text in reviews], OVERLAP_THRESHOLD)
         for i in range(len(reviews)):
             if i in visited:
                 continue
-            candidates = lsh.query(minhashes[i])
-            cluster_indices = [int(name.split('_')[1]) for name in candidates]
-            # Second-pass filter to verify actual duplicates or just shorter subsets
-            for j in range(len(reviews)):
-                if j not in cluster_indices and j not in visited:
-                    if self._word_overlap(reviews[i], reviews[j]) > OVERLAP_THRESHOLD:
-                        cluster_indices.append(j)
+            cluster_indices = sorted(lsh_candidates[i])
+            # Second-pass filter to verify actual duplicates or just shorter subsets;
+            # the inverted index only returns reviews that pass the overlap check, in index order
+            in_cluster = set(cluster_indices)
+            for j in overlap_index.query(i):
+                if j not in in_cluster and j not in visited:
+                    cluster_indices.append(j)
             new_cluster = [idx for idx in cluster_indices if idx not in visited]
             if new_cluster:
                 clusters.append(new_cluster)
                 visited.update(new_cluster)
+        if self.embedding_dedup is not None:
+            clusters = self._merge_semantic(clusters, reviews, embeddings)
         # Representative selection
-        final_reviews = []
+        results = []
         for cluster in clusters:
-            representative_idx = max(cluster, key=lambda idx: (self._calculate_aspect_score(reviews[idx], category), len(reviews[idx])))
-            if self._calculate_aspect_score(reviews[representative_idx], category) > 0:
-                final_reviews.append(reviews[representative_idx])
-        return final_reviews
+            scores = {idx: self._calculate_aspect_score(reviews[idx], category) for idx in cluster}
+            representative_idx = max(cluster, key=lambda idx: (scores[idx], len(reviews[idx])))
+            results.append(DuplicateCluster(cluster, [ids[idx] for idx in cluster], representative_idx, scores[representative_idx], signatures[cluster]))
+        self.score_cache.flush() # make this batch's scores visible to other workers
+        return results
     
 # # Test script
 # from lexical_cleaning import LexicalCleaner
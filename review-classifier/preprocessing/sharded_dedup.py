@@ -0,0 +1,90 @@
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import Callable, Iterable
+from semantic_deduplicator import SemanticDeduplicator
+
+## Parallel driver for SemanticDeduplicator across many places.
+## Reviews tagged with (place_id, category) are grouped into shards; duplicates never cross a shard, so
+## every shard is deduplicated independently on a process pool. Shards are dispatched largest first,
+## so the biggest places start right away and the small ones fill the remaining cores (total time is
+## close to total work / cores unless a single place dominates the corpus).
+## Each worker builds one SemanticDeduplicator; pass score_cache_path in dedup_kwargs to share scores.
+
+class ShardResult:
+    def __init__(self, place_id: str, category: str, input_count: int, reviews: list[str], seconds: float):
+        self.place_id = place_id
+        self.category = category
+        self.input_count = input_count
+        self.reviews = reviews # kept representatives
+        self.seconds = seconds
+
+    def __repr__(self) -> str:
+        return f"ShardResult({self.place_id!r}, {self.category!r}, {self.input_count} -> {len(self.reviews)}, {self.seconds:.3f}s)"
+
+# progress(done_shards, total_shards, result) is called in the parent as each shard finishes
+ProgressCallback = Callable[[int, int, ShardResult], None]
+
+_worker_deduplicator = None
+
+def _init_worker(dedup_kwargs: dict) -> None:
+    global _worker_deduplicator
+    _worker_deduplicator = SemanticDeduplicator(**dedup_kwargs)
+
+def _run_shard(shard: tuple[str, str, list[str]]) -> ShardResult:
+    place_id, category, texts = shard
+    start = time.perf_counter()
+    kept = _worker_deduplicator.deduplicate(texts, category)
+    return ShardResult(place_id, category, len(texts), kept, time.perf_counter() - start)
+
+def group_shards(reviews: Iterable[tuple[str, str, str]]) -> list[tuple[str, str, list[str]]]:
+    shards: dict[tuple[str, str], list[str]] = defaultdict(list)
+    for place_id, category, text in reviews:
+        shards[(place_id, category)].append(text)
+    # Largest first (longest processing time first scheduling)
+    return sorted(((p, c, texts) for (p, c), texts in shards.items()), key=lambda shard: -len(shard[2]))
+
+# reviews: (place_id, category, cleaned text) triples. Returns one ShardResult per (place_id, category).
+def deduplicate_sharded(reviews: Iterable[tuple[str, str, str]], workers: int | None = None,
+                        dedup_kwargs: dict | None = None, progress: ProgressCallback | None = None) -> dict[tuple[str, str], ShardResult]:
+    dedup_kwargs = dedup_kwargs or {}
+    shards = group_shards(reviews)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(shards)))
+    results = {}
+    def collect(result: ShardResult) -> None:
+        results[(result.place_id, result.category)] = result
+        if progress is not None:
+            progress(len(results), len(shards), result)
+    if workers == 1:
+        _init_worker(dedup_kwargs)
+        for shard in shards:
+            collect(_run_shard(shard))
+        return results
+    pool = Pool(processes=workers, initializer=_init_worker, initargs=(dedup_kwargs,))
+    try:
+        # chunksize=1 keeps the largest-first order and lets idle workers pick up the next shard
+        for result in pool.imap_unordered(_run_shard, shards, chunksize=1):
+            collect(result)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def print_progress(done: int, total: int, result: ShardResult) -> None:
+    print(f"[{done}/{total}] {result.place_id} ({result.category}): {result.input_count} -> {len(result.reviews)} reviews in {result.seconds:.2f}s")
+
+# # Test script
+# reviews = [
+#     ("place-1", "restaurant", "the ribeye was succulent and the server was so helpful."),
+#     ("place-1", "restaurant", "the ribeye was succulent and the server was so helpful! amazing!"),
+#     ("place-2", "cafe", "the latte art was beautiful and the pastries were fresh."),
+# ]
+# results = deduplicate_sharded(reviews, workers=2, dedup_kwargs={"score_cache_path": "data/cache/aspect_scores.sqlite"}, progress=print_progress)
+# for key, result in results.items():
+#     print(key, result.reviews)
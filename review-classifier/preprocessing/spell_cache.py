@@ -0,0 +1,33 @@
+import re
+from typing import Iterable
+from disk_cache import DiskLRUCache
+
+## Memo of spell-check decisions made by LexicalCleaner, keyed by the lowercased word core.
+## The stored value is the word to emit: the correction, or the word itself when TextBlob is not confident.
+## Known-correct words outside the dictionary (brand and place names) are pinned as "no correction",
+## so they are never sent to the spellchecker and never evicted.
+
+EDGE_PUNCT_PATTERN = re.compile(r'^\W+|\W+$')
+
+class SpellCorrectionCache(DiskLRUCache):
+    def __init__(self, path: str | None = None, capacity: int = 200_000, **kwargs):
+        super().__init__(path=path, capacity=capacity, **kwargs)
+
+    def add_known_words(self, words: Iterable[str]) -> int:
+        count = 0
+        for word in words:
+            # Mirror the normalization clean() applies before spellchecking
+            core = EDGE_PUNCT_PATTERN.sub('', word.lower().encode("ascii", "ignore").decode())
+            if core:
+                self.put(core, core, pinned=True)
+                count += 1
+        self.flush()
+        return count
+
+    # Pin every token of the names stored in the place table, e.g. "Rochester" from "Starbucks Rochester Park"
+    def add_place_names(self, conn) -> int:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM place WHERE name IS NOT NULL")
+        words = [word for (name,) in cursor.fetchall() for word in name.split()]
+        cursor.close()
+        return self.add_known_words(words)
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from disk_cache import DiskLRUCache
+
+## Batched translation of non-English reviews into English.
+## A batch of texts is deduplicated, looked up in the translation memory, grouped by source language
+## and sent to the translator backend as a few concurrent requests (bounded by a semaphore),
+## instead of one blocking round-trip per review.
+## Backends are pluggable: Google Translate for production and a local stub for offline runs.
+
+SKIP_LANGUAGES = {"en", "und"} # English or undetermined (e.g. emoji-only) text is left as is
+
+class TranslatorBackend(ABC):
+    max_batch_size = 16
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def translate_batch(self, texts: list[str], src: str) -> list[str]:
+        ...
+
+class GoogleTranslatorBackend(TranslatorBackend):
+    def __init__(self, max_batch_size: int = 16, list_concurrency: int = 4):
+        self.max_batch_size = max_batch_size
+        self.list_concurrency = list_concurrency
+        self.translator = None
+
+    # The HTTP client is bound to the running event loop, so it lives for one translation run
+    async def open(self) -> None:
+        from googletrans import Translator
+        self.translator = Translator(list_operation_max_concurrency=self.list_concurrency)
+        await self.translator.__aenter__()
+
+    async def close(self) -> None:
+        if self.translator is not None:
+            await self.translator.__aexit__(None, None, None)
+            self.translator = None
+
+    async def translate_batch(self, texts: list[str], src: str) -> list[str]:
+        results = await self.translator.translate(texts, src=src, dest="en")
+        return [result.text for result in results]
+
+# Offline stand-in: translates through a fixed phrasebook and leaves anything else untouched
+class StubTranslatorBackend(TranslatorBackend):
+    def __init__(self, phrasebook: dict[str, str] | None = None, latency: float = 0.0, max_batch_size: int = 16):
+        self.phrasebook = phrasebook or {}
+        self.latency = latency
+        self.max_batch_size = max_batch_size
+        self.calls = 0
+
+    async def translate_batch(self, texts: list[str], src: str) -> list[str]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self.phrasebook.get(text, text) for text in texts]
+
+# Translation memory keyed by (source language, text hash)
+class TranslationMemory(DiskLRUCache):
+    @staticmethod
+    def key(src: str, text: str) -> str:
+        return f"{src}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    def lookup(self, src: str, text: str) -> str | None:
+        return self.get(self.key(src, text))
+
+    def store(self, src: str, text: str, translation: str) -> None:
+        self.put(self.key(src, text), translation)
+
+class TranslationStage:
+    def __init__(self, backend: TranslatorBackend | None = None, memory: TranslationMemory | None = None, max_concurrency: int = 4):
+        self.backend = backend or GoogleTranslatorBackend()
+        self.memory = memory if memory is not None else TranslationMemory()
+        self.max_concurrency = max_concurrency
+
+    async def translate_async(self, texts: list[str], languages: list[str]) -> list[str]:
+        results = list(texts)
+        pending: dict[tuple[str, str], list[int]] = defaultdict(list) # identical texts are translated once
+        for i, (text, lang) in enumerate(zip(texts, languages)):
+            if not text or lang in SKIP_LANGUAGES:
+                continue
+            cached = self.memory.lookup(lang, text)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending[(lang, text)].append(i)
+        if not pending:
+            return results
+        by_language: dict[str, list[str]] = defaultdict(list)
+        for lang, text in pending:
+            by_language[lang].append(text)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(lang: str, batch: list[str]) -> None:
+            async with semaphore:
+                try:
+                    translated = await self.backend.translate_batch(batch, src=lang)
+                except Exception as e:
+                    print(f"Translation of {len(batch)} '{lang}' texts failed: {e}. Keeping the original text.")
+                    return
+            for text, translation in zip(batch, translated):
+                self.memory.store(lang, text, translation)
+                for i in pending[(lang, text)]:
+                    results[i] = translation
+
+        size = self.backend.max_batch_size
+        await self.backend.open()
+        try:
+            await asyncio.gather(*[
+                run(lang, batch[start:start + size])
+                for lang, batch in by_language.items()
+                for start in range(0, len(batch), size)
+            ])
+        finally:
+            await self.backend.close()
+        self.memory.flush()
+        return results
+
+    # One event loop per batch rather than one per review
+    def translate(self, texts: list[str], languages: list[str]) -> list[str]:
+        if all(not text or lang in SKIP_LANGUAGES for text, lang in zip(texts, languages)):
+            return list(texts) # nothing to translate, no need for an event loop
+        return asyncio.run(self.translate_async(texts, languages))
+
+# # Test script
+# stage = TranslationStage(backend=StubTranslatorBackend({"la pizza était délicieuse": "the pizza was delicious"}))
+# print(stage.translate(["la pizza était délicieuse", "la pizza était délicieuse", "great coffee"], ["fr", "fr", "en"]))
+# print(stage.backend.calls, stage.memory.stats())
@@ -0,0 +1,104 @@
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, Sequence
+
+## Bulk writes into PostgreSQL through COPY.
+## Rows are streamed in batches into a temporary staging table with COPY FROM STDIN, then merged into
+## the target with a single INSERT ... SELECT ... ON CONFLICT per batch. Rows repeated inside a batch are
+## collapsed first (ON CONFLICT cannot touch the same row twice in one statement).
+## Transaction scope:
+##   "load"  - everything written through the loader commits at once when it is closed (all or nothing)
+##   "table" - commit after each load() call
+##   "batch" - commit after every batch (bounded transaction size, partial progress survives a failure)
+
+TRANSACTION_SCOPES = ("load", "table", "batch")
+
+# COPY text format: tab separated, \N for NULL, backslash escapes
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat(sep=" ")
+    elif isinstance(value, float):
+        value = repr(value)
+    else:
+        value = str(value)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def _batched(rows: Iterable[Sequence], size: int) -> Iterator[list[Sequence]]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+class BulkLoader:
+    def __init__(self, conn, batch_size: int = 50_000, transaction: str = "load"):
+        if transaction not in TRANSACTION_SCOPES:
+            raise ValueError(f"transaction must be one of {TRANSACTION_SCOPES}, got {transaction!r}")
+        self.conn = conn
+        self.batch_size = batch_size
+        self.transaction = transaction
+        self.stats: list[dict] = []
+        self._staging: set[str] = set()
+
+    def __enter__(self) -> "BulkLoader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+
+    def _stage(self, cursor, table: str, columns: Sequence[str]) -> str:
+        staging = f"_stage_{table}"
+        if staging not in self._staging:
+            # Same column types as the target; lives until the connection is closed
+            cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA")
+            self._staging.add(staging)
+        else:
+            cursor.execute(f"TRUNCATE {staging}")
+        return staging
+
+    # update=None leaves existing rows untouched (DO NOTHING); a list of columns overwrites them with the new
+    # values, a dict maps columns to SQL expressions over the existing row ({table}.col) and EXCLUDED.col
+    def load(self, table: str, columns: Sequence[str], rows: Iterable[Sequence], conflict: Sequence[str],
+             update: Sequence[str] | dict[str, str] | None = None) -> dict:
+        if update:
+            if not isinstance(update, dict):
+                update = {column: f"EXCLUDED.{column}" for column in update}
+            action = "DO UPDATE SET " + ", ".join(f"{column} = {expression}" for column, expression in update.items())
+        else:
+            action = "DO NOTHING"
+        column_list = ", ".join(columns)
+        start = time.perf_counter()
+        count = 0
+        with self.conn.cursor() as cursor:
+            for batch in _batched(rows, self.batch_size):
+                staging = self._stage(cursor, table, columns)
+                buffer = io.StringIO()
+                for row in batch:
+                    buffer.write("\t".join(map(_copy_value, row)))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN", buffer)
+                cursor.execute(
+                    f"INSERT INTO {table} ({column_list}) "
+                    f"SELECT DISTINCT ON ({', '.join(conflict)}) {column_list} FROM {staging} "
+                    f"ON CONFLICT ({', '.join(conflict)}) {action}"
+                )
+                count += len(batch)
+                if self.transaction == "batch":
+                    self.conn.commit()
+        if self.transaction == "table":
+            self.conn.commit()
+        seconds = time.perf_counter() - start
+        stats = {"table": table, "rows": count, "seconds": seconds, "rows_per_second": count / seconds if seconds else 0.0}
+        self.stats.append(stats)
+        print(f"Loaded {count} rows into {table} in {seconds:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+        return stats
@@ -1,6 +1,11 @@
 from dotenv import load_dotenv
 import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
 import psycopg2
+from psycopg2 import pool as pg_pool
 from qdrant_client import QdrantClient
 
 load_dotenv() # Load environment variables from .env file from the root directory
@@ -8,16 +13,32 @@ load_dotenv() # Load environment variables from .env file from the root director
 BASE_DIR = os.path.dirname(__file__)
 sql_path = os.path.join(BASE_DIR, 'postgresql', 'tables.sql')
 
+## Connections are configured from .env (see config/docker-compose.yml).
+## establish_* open a fresh connection/client each call (connection checks, notebooks).
+## The ingestion, schema and search code shares connections instead:
+##   - get_postgres_pool(): process-wide PostgresPool, `with get_postgres_pool().connection() as conn:` checks
+##     out a health-checked connection, commits on success, rolls back on error and returns it to the pool
+##   - get_async_postgres_pool(): the asyncpg counterpart for async code (translation), same config and metrics;
+##     `async with get_async_postgres_pool().connection() as conn:`
+##   - get_qdrant_client(): one shared QdrantClient; its HTTP session keeps connections alive
+## Pool sizes come from POSTGRES_POOL_MIN / POSTGRES_POOL_MAX; metrics() reports usage and wait times.
+
+def postgres_config() -> dict:
+    # These parameters should match those set in the docker-compose.yml from config folder
+    return {
+        "dbname": os.getenv("POSTGRES_DB"),
+        "user": os.getenv("POSTGRES_USER"),
+        "password": os.getenv("POSTGRES_PASSWORD"),
+        "host": os.getenv("POSTGRES_HOST"),
+        "port": os.getenv("POSTGRES_PORT")
+    }
+
+def pool_size_config() -> tuple[int, int]:
+    return int(os.getenv("POSTGRES_POOL_MIN", "1")), int(os.getenv("POSTGRES_POOL_MAX", "10"))
+
 def establish_postgres_connection():
     # Establish a connection to the PostgreSQL database run in Docker
-    # These parameters should match those set in the docker-compose.yml from config folder
-    conn = psycopg2.connect(
-        dbname=os.getenv("POSTGRES_DB"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD"),
-        host=os.getenv("POSTGRES_HOST"),
-        port=os.getenv("POSTGRES_PORT")
-    )
+    conn = psycopg2.connect(**postgres_config())
     return conn
 
 def establish_qdrant_connection():
@@ -28,6 +49,224 @@ def establish_qdrant_connection():
     client = QdrantClient(host=host, port=port)
     return client
 
+class PoolMetrics:
+    def __init__(self):
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.health_check_failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "avg_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            "max_wait": self.max_wait,
+            "timeouts": self.timeouts,
+            "health_check_failures": self.health_check_failures
+        }
+
+class PostgresPool:
+    def __init__(self, minconn: int | None = None, maxconn: int | None = None, timeout: float = 30.0,
+                 idle_check_after: float = 30.0, **config):
+        default_min, default_max = pool_size_config()
+        self.minconn = default_min if minconn is None else minconn
+        self.maxconn = default_max if maxconn is None else maxconn
+        self.timeout = timeout # seconds to wait for a free connection before raising
+        self.idle_check_after = idle_check_after # ping connections that sat idle longer than this
+        self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **{**postgres_config(), **config})
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._last_used: dict[int, float] = {}
+        self._metrics = PoolMetrics()
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.idle_check_after:
+            return True # freshly opened or recently used
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._metrics.timeouts += 1
+            raise TimeoutError(f"No PostgreSQL connection available after {self.timeout}s ({self.maxconn} in use)")
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                with self._lock:
+                    self._metrics.health_check_failures += 1
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+        waited = time.monotonic() - start
+        with self._lock:
+            m = self._metrics
+            m.checkouts += 1
+            m.in_use += 1
+            m.max_in_use = max(m.max_in_use, m.in_use)
+            m.total_wait += waited
+            m.max_wait = max(m.max_wait, waited)
+        return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        close = close or conn.closed
+        # ids of closed connections get reused, so their entries must not outlive them
+        if close:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self._metrics.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            result = self._metrics.as_dict()
+        result["idle"] = len(self._pool._pool)
+        result["max_size"] = self.maxconn
+        return result
+
+    def close(self) -> None:
+        self._pool.closeall()
+        self._last_used.clear()
+
+class AsyncPostgresPool:
+    def __init__(self, minconn: int | None = None, maxconn: int | None = None, timeout: float = 30.0, **config):
+        default_min, default_max = pool_size_config()
+        self.minconn = default_min if minconn is None else minconn
+        self.maxconn = default_max if maxconn is None else maxconn
+        self.timeout = timeout
+        config = {**postgres_config(), **config}
+        config["database"] = config.pop("dbname")
+        if config.get("port"):
+            config["port"] = int(config["port"])
+        self._config = config
+        self._pool = None
+        self._open_lock = asyncio.Lock() # concurrent first callers must not each create a pool
+        self._metrics = PoolMetrics()
+
+    async def open(self) -> "AsyncPostgresPool":
+        async with self._open_lock:
+            if self._pool is None:
+                import asyncpg
+                # asyncpg validates connections on release and resets their state before reuse
+                self._pool = await asyncpg.create_pool(min_size=self.minconn, max_size=self.maxconn, **self._config)
+        return self
+
+    @asynccontextmanager
+    async def connection(self):
+        await self.open()
+        start = time.monotonic()
+        try:
+            conn = await self._pool.acquire(timeout=self.timeout)
+        except (TimeoutError, asyncio.TimeoutError):
+            self._metrics.timeouts += 1
+            raise
+        waited = time.monotonic() - start
+        m = self._metrics
+        m.checkouts += 1
+        m.in_use += 1
+        m.max_in_use = max(m.max_in_use, m.in_use)
+        m.total_wait += waited
+        m.max_wait = max(m.max_wait, waited)
+        try:
+            yield conn
+        finally:
+            m.in_use -= 1
+            await self._pool.release(conn)
+
+    def metrics(self) -> dict:
+        result = self._metrics.as_dict()
+        result["idle"] = self._pool.get_idle_size() if self._pool is not None else 0
+        result["max_size"] = self.maxconn
+        return result
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+_postgres_pool: PostgresPool | None = None
+_async_postgres_pool: AsyncPostgresPool | None = None
+_qdrant_client: QdrantClient | None = None
+_shared_lock = threading.Lock()
+
+# Process-wide pools and client, created on first use
+def get_postgres_pool() -> PostgresPool:
+    global _postgres_pool
+    with _shared_lock:
+        if _postgres_pool is None:
+            _postgres_pool = PostgresPool()
+        return _postgres_pool
+
+def get_async_postgres_pool() -> AsyncPostgresPool:
+    global _async_postgres_pool
+    with _shared_lock:
+        if _async_postgres_pool is None:
+            _async_postgres_pool = AsyncPostgresPool()
+        return _async_postgres_pool
+
+def get_qdrant_client() -> QdrantClient:
+    global _qdrant_client
+    with _shared_lock:
+        if _qdrant_client is None:
+            _qdrant_client = establish_qdrant_connection()
+        return _qdrant_client
+
+def close_shared_connections() -> None:
+    global _postgres_pool, _qdrant_client
+    with _shared_lock:
+        if _postgres_pool is not None:
+            _postgres_pool.close()
+            _postgres_pool = None
+        if _qdrant_client is not None:
+            _qdrant_client.close()
+            _qdrant_client = None
+
+async def close_async_postgres_pool() -> None:
+    global _async_postgres_pool
+    with _shared_lock:
+        pool, _async_postgres_pool = _async_postgres_pool, None
+    if pool is not None:
+        await pool.close()
+
 # Test connections
 def init_connection():
     postgre_connection = establish_postgres_connection()
@@ -37,4 +276,4 @@ def init_connection():
     print("Connection initialized successfully.")
 
 if __name__ == "__main__":
-    init_connection()
\ No newline at end of file
+    init_connection()
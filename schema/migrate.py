@@ -0,0 +1,227 @@
+from dotenv import load_dotenv
+import os
+import re
+import json
+import hashlib
+from connect_db import get_postgres_pool, get_qdrant_client, close_shared_connections
+from qdrant_client.http.models import VectorParams, VectorParamsDiff, HnswConfigDiff, PayloadSchemaType
+from qdrant_writer import load_collection_schema, ensure_payload_indexes
+from queries import REBUILD_PLACE_RATING_STATS_SQL
+
+## Non-destructive schema migrations for PostgreSQL and Qdrant. Running it on an up-to-date deployment
+## changes nothing; otherwise only the differences between the schema files and the live state are applied.
+## PostgreSQL: tables.sql is idempotent (IF NOT EXISTS / OR REPLACE) and runs in two phases. Extensions,
+##   types and tables come first; columns declared in tables.sql but missing from an existing table are then
+##   added with ALTER TABLE ... ADD COLUMN; indexes, functions and triggers run last, so they can depend on
+##   the added columns. When the rating triggers are added to an existing database, place_rating_stats
+##   is filled from the stored reviews in the same transaction. Every applied version (sha256 of
+##   tables.sql) and its changes are recorded in schema_migrations, and a version that is already
+##   recorded is skipped without any diffing.
+## Qdrant: missing collections are created; missing payload indexes are created (an index whose type changed
+##   is rebuilt), and changed HNSW parameters are updated in place, Qdrant re-indexes in the background.
+## Changes that would lose or rewrite data (dropped or retyped columns, new/resized/re-metric vectors) are
+## only reported; they need a hand-written migration or an explicit recreate and re-embed.
+
+BASE_DIR = os.path.dirname(__file__)
+sql_path = os.path.join(BASE_DIR, 'postgresql', 'tables.sql')
+QDRANT_COLLECTIONS = ["context_feature", "review_feature"]
+
+load_dotenv()
+
+MIGRATIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    id BIGSERIAL PRIMARY KEY,
+    component TEXT NOT NULL,
+    version TEXT NOT NULL,
+    changes JSONB NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT now()
+);
+"""
+
+# Table constraints inside CREATE TABLE, as opposed to column definitions
+CONSTRAINT_KEYWORDS = ("PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "CONSTRAINT", "EXCLUDE", "LIKE")
+CREATE_TABLE_PATTERN = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\(', re.IGNORECASE)
+# Statements of the first phase; everything else (indexes, functions, triggers, ...) may use their columns
+STRUCTURE_PATTERN = re.compile(r'CREATE\s+(?:EXTENSION|TYPE|TABLE)\b', re.IGNORECASE)
+DOLLAR_QUOTE_PATTERN = re.compile(r'\$(?:[A-Za-z_]\w*)?\$')
+
+# Top-level statements of a SQL script, without comments; semicolons inside quotes, dollar-quoted
+# function bodies and comments do not split
+def split_statements(sql: str) -> list[str]:
+    statements, current, i = [], [], 0
+    while i < len(sql):
+        if sql.startswith('--', i):
+            i = sql.find('\n', i)
+            i = len(sql) if i < 0 else i
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = len(sql) if end < 0 else end + 2
+            continue
+        quote = DOLLAR_QUOTE_PATTERN.match(sql, i) if sql[i] == '$' else None
+        if quote or sql[i] == "'":
+            delimiter = quote.group() if quote else "'"
+            end = sql.find(delimiter, i + len(delimiter))
+            end = len(sql) if end < 0 else end + len(delimiter)
+            current.append(sql[i:end])
+            i = end
+            continue
+        if sql[i] == ';':
+            statements.append("".join(current).strip())
+            current = []
+        else:
+            current.append(sql[i])
+        i += 1
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+def _split_top_level(body: str) -> list[str]:
+    parts, depth, current = [], 0, []
+    for c in body:
+        if c == ',' and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        depth += (c == '(') - (c == ')')
+        current.append(c)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+# table -> {column: full column definition}, in file order
+def declared_columns(sql: str) -> dict[str, dict[str, str]]:
+    sql = re.sub(r'--[^\n]*', '', sql)
+    tables = {}
+    for match in CREATE_TABLE_PATTERN.finditer(sql):
+        depth, end = 1, match.end()
+        while depth:
+            depth += (sql[end] == '(') - (sql[end] == ')')
+            end += 1
+        columns = {}
+        for definition in _split_top_level(sql[match.end():end - 1]):
+            name = definition.split()[0]
+            if name.upper() not in CONSTRAINT_KEYWORDS:
+                columns[name.strip('"').lower()] = " ".join(definition.split())
+        tables[match.group(1).lower()] = columns
+    return tables
+
+def live_columns(cursor) -> dict[str, set[str]]:
+    cursor.execute("SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = current_schema()")
+    tables: dict[str, set[str]] = {}
+    for table, column in cursor.fetchall():
+        tables.setdefault(table, set()).add(column)
+    return tables
+
+def schema_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def applied_version(cursor, component: str) -> str | None:
+    cursor.execute("SELECT version FROM schema_migrations WHERE component = %s ORDER BY id DESC LIMIT 1", (component,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+# Returns the list of applied changes (empty when the recorded version is current)
+def migrate_postgres(conn, force: bool = False) -> list[str]:
+    with open(sql_path, 'r') as f:
+        sql = f.read()
+    version = schema_version(sql)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))") # one migrator at a time
+        cursor.execute(MIGRATIONS_TABLE_SQL)
+        if not force and applied_version(cursor, "postgres") == version:
+            conn.commit()
+            print("PostgreSQL schema is up to date.")
+            return []
+        before = live_columns(cursor)
+        statements = split_statements(sql)
+        for statement in statements:
+            if STRUCTURE_PATTERN.match(statement):
+                cursor.execute(statement)
+        changes = [f"create table {table}" for table in declared_columns(sql) if table not in before]
+        for table, columns in declared_columns(sql).items():
+            if table not in before:
+                continue
+            for column, definition in columns.items():
+                if column not in before[table]:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {definition}")
+                    changes.append(f"add column {table}.{column}")
+            for column in sorted(before[table] - set(columns)):
+                print(f"[WARN] {table}.{column} exists but is not declared in tables.sql; drop it with a manual migration if intended")
+        for statement in statements:
+            if not STRUCTURE_PATTERN.match(statement):
+                cursor.execute(statement)
+        # The rating triggers only count new reviews; seed their table from the reviews already stored.
+        # CREATE TRIGGER holds a lock on review until commit, so no write slips in between.
+        if "review" in before and "place_rating_stats" not in before:
+            cursor.execute(REBUILD_PLACE_RATING_STATS_SQL)
+            changes.append("rebuild place_rating_stats")
+        cursor.execute(
+            "INSERT INTO schema_migrations (component, version, changes) VALUES (%s, %s, %s)",
+            ("postgres", version, json.dumps(changes))
+        )
+    conn.commit()
+    print(f"PostgreSQL schema migrated to {version[:12]}: {', '.join(changes) or 'no structural changes'}")
+    return changes
+
+def _hnsw_diff(declared: dict | None, live) -> HnswConfigDiff | None:
+    if not declared:
+        return None
+    changed = {key: value for key, value in declared.items() if getattr(live, key, None) != value}
+    return HnswConfigDiff(**changed) if changed else None
+
+def _vector_params(cfg: dict) -> VectorParams:
+    hnsw = HnswConfigDiff(**cfg["hnsw_config"]) if cfg.get("hnsw_config") else None
+    return VectorParams(size=cfg["size"], distance=cfg["distance"], hnsw_config=hnsw)
+
+def migrate_collection(client, schema: dict) -> list[str]:
+    name = schema["name"]
+    if not client.collection_exists(name):
+        client.create_collection(
+            collection_name=name,
+            vectors_config={vector: _vector_params(cfg) for vector, cfg in schema["vectors"].items()},
+            hnsw_config=HnswConfigDiff(**schema["hnsw_config"]) if schema.get("hnsw_config") else None
+        )
+        indexed = ensure_payload_indexes(client, schema)
+        return [f"create collection {name}"] + [f"index {name}.{field}" for field in indexed]
+    info = client.get_collection(name)
+    changes = []
+    live_vectors = info.config.params.vectors
+    live_vectors = live_vectors if isinstance(live_vectors, dict) else {"": live_vectors}
+    vector_updates = {}
+    for vector, cfg in schema["vectors"].items():
+        live = live_vectors.get(vector)
+        if live is None:
+            print(f"[WARN] {name}: vector {vector!r} is missing; named vectors cannot be added in place, recreate the collection")
+            continue
+        if live.size != cfg["size"] or live.distance.value != cfg["distance"]:
+            print(f"[WARN] {name}: vector {vector!r} is {live.size}/{live.distance.value}, declared {cfg['size']}/{cfg['distance']}; needs a re-embed")
+            continue
+        diff = _hnsw_diff(cfg.get("hnsw_config"), live.hnsw_config)
+        if diff is not None:
+            vector_updates[vector] = VectorParamsDiff(hnsw_config=diff)
+            changes.append(f"hnsw {name}.{vector}")
+    hnsw = _hnsw_diff(schema.get("hnsw_config"), info.config.hnsw_config)
+    if hnsw is not None:
+        changes.append(f"hnsw {name}")
+    if hnsw is not None or vector_updates:
+        client.update_collection(collection_name=name, hnsw_config=hnsw, vectors_config=vector_updates or None)
+    # A declared index with a different type is rebuilt; indexes only cost a rebuild, never a re-embed
+    live_indexes = info.payload_schema or {}
+    for field in schema.get("payload_indexes", []):
+        declared = PayloadSchemaType(schema["payload_schema"][field])
+        if field in live_indexes and live_indexes[field].data_type != declared:
+            client.delete_payload_index(collection_name=name, field_name=field, wait=True)
+    changes += [f"index {name}.{field}" for field in ensure_payload_indexes(client, schema)]
+    return changes
+
+def migrate_qdrant(client) -> list[str]:
+    changes = []
+    for collection in QDRANT_COLLECTIONS:
+        changes += migrate_collection(client, load_collection_schema(collection))
+    print(f"Qdrant schema migrated: {', '.join(changes) or 'no changes'}")
+    return changes
+
+if __name__ == "__main__":
+    with get_postgres_pool().connection() as conn:
+        migrate_postgres(conn)
+    migrate_qdrant(get_qdrant_client())
+    close_shared_connections()
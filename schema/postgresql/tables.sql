@@ -1,7 +1,9 @@
+-- Every statement is idempotent: schema/migrate.py re-runs this file and adds columns missing from existing tables
+
 CREATE EXTENSION IF NOT EXISTS vector;
 
 -- Place table
-CREATE TABLE place (
+CREATE TABLE IF NOT EXISTS place (
     place_id UUID PRIMARY KEY,
     name TEXT NOT NULL,
     category TEXT,
@@ -14,14 +16,15 @@ CREATE TABLE place (
 );
 
 -- User table
-CREATE TABLE users (
+-- reviews is no longer written by ingestion; a user's reviews are looked up via review.user_id
+CREATE TABLE IF NOT EXISTS users (
     user_id UUID PRIMARY KEY,
     name TEXT NOT NULL,
     reviews JSONB
 );
 
 -- Review table
-CREATE TABLE review (
+CREATE TABLE IF NOT EXISTS review (
     review_id UUID PRIMARY KEY,
     place_id UUID REFERENCES place(place_id) ON DELETE CASCADE,
     user_id UUID REFERENCES users(user_id) ON DELETE SET NULL,
@@ -31,9 +34,74 @@ CREATE TABLE review (
     language TEXT,
     timestamp TIMESTAMP
 );
+CREATE INDEX IF NOT EXISTS review_user_id_idx ON review (user_id);
+
+-- Per-place rating aggregates, maintained by statement-level triggers on review
+-- Reads are a primary key lookup; every insert, update or delete of reviews adjusts the counts in place
+CREATE TABLE IF NOT EXISTS place_rating_stats (
+    place_id UUID PRIMARY KEY REFERENCES place(place_id) ON DELETE CASCADE,
+    review_count BIGINT NOT NULL DEFAULT 0,
+    rating_count BIGINT NOT NULL DEFAULT 0,
+    rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    avg_rating DOUBLE PRECISION GENERATED ALWAYS AS (rating_sum / NULLIF(rating_count, 0)) STORED,
+    rating_1 BIGINT NOT NULL DEFAULT 0, -- histogram of ratings rounded to 1..5
+    rating_2 BIGINT NOT NULL DEFAULT 0,
+    rating_3 BIGINT NOT NULL DEFAULT 0,
+    rating_4 BIGINT NOT NULL DEFAULT 0,
+    rating_5 BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION place_rating_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE place_rating_stats s SET
+            review_count = s.review_count - d.review_count,
+            rating_count = s.rating_count - d.rating_count,
+            rating_sum = s.rating_sum - d.rating_sum,
+            rating_1 = s.rating_1 - d.rating_1,
+            rating_2 = s.rating_2 - d.rating_2,
+            rating_3 = s.rating_3 - d.rating_3,
+            rating_4 = s.rating_4 - d.rating_4,
+            rating_5 = s.rating_5 - d.rating_5
+        FROM (
+            SELECT place_id, count(*) AS review_count, count(rating) AS rating_count, COALESCE(sum(rating), 0) AS rating_sum,
+                   count(*) FILTER (WHERE round(rating) = 1) AS rating_1, count(*) FILTER (WHERE round(rating) = 2) AS rating_2,
+                   count(*) FILTER (WHERE round(rating) = 3) AS rating_3, count(*) FILTER (WHERE round(rating) = 4) AS rating_4,
+                   count(*) FILTER (WHERE round(rating) = 5) AS rating_5
+            FROM old_rows WHERE place_id IS NOT NULL GROUP BY place_id
+        ) d
+        WHERE s.place_id = d.place_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO place_rating_stats AS s (place_id, review_count, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+        SELECT place_id, count(*), count(rating), COALESCE(sum(rating), 0),
+               count(*) FILTER (WHERE round(rating) = 1), count(*) FILTER (WHERE round(rating) = 2),
+               count(*) FILTER (WHERE round(rating) = 3), count(*) FILTER (WHERE round(rating) = 4),
+               count(*) FILTER (WHERE round(rating) = 5)
+        FROM new_rows WHERE place_id IS NOT NULL GROUP BY place_id
+        ON CONFLICT (place_id) DO UPDATE SET
+            review_count = s.review_count + EXCLUDED.review_count,
+            rating_count = s.rating_count + EXCLUDED.rating_count,
+            rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+            rating_1 = s.rating_1 + EXCLUDED.rating_1,
+            rating_2 = s.rating_2 + EXCLUDED.rating_2,
+            rating_3 = s.rating_3 + EXCLUDED.rating_3,
+            rating_4 = s.rating_4 + EXCLUDED.rating_4,
+            rating_5 = s.rating_5 + EXCLUDED.rating_5;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER review_rating_stats_insert AFTER INSERT ON review
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION place_rating_stats_apply();
+CREATE OR REPLACE TRIGGER review_rating_stats_update AFTER UPDATE ON review
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION place_rating_stats_apply();
+CREATE OR REPLACE TRIGGER review_rating_stats_delete AFTER DELETE ON review
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION place_rating_stats_apply();
 
 -- Review Feature Store
-CREATE TABLE review_feature_store (
+CREATE TABLE IF NOT EXISTS review_feature_store (
     review_id UUID PRIMARY KEY REFERENCES review(review_id) ON DELETE CASCADE,
     place_id UUID REFERENCES place(place_id) ON DELETE CASCADE,
     pos_diversity DOUBLE PRECISION,
@@ -55,9 +123,18 @@ CREATE TABLE review_feature_store (
     timestamp TIMESTAMP,
     result JSONB
 );
+CREATE INDEX IF NOT EXISTS review_feature_store_place_id_idx ON review_feature_store (place_id);
+CREATE INDEX IF NOT EXISTS review_feature_store_timestamp_idx ON review_feature_store (timestamp);
+-- Approximate nearest-neighbour indexes for cosine distance (<=>). Build parameters: m = graph degree,
+-- ef_construction = candidate list while building; the search side is tuned per query (hnsw.ef_search),
+-- see schema/vector_search.py. Rebuild with other parameters or IVFFlat via create_vector_index().
+CREATE INDEX IF NOT EXISTS review_feature_store_semantic_embedding_hnsw_idx ON review_feature_store
+    USING hnsw (semantic_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX IF NOT EXISTS review_feature_store_hybrid_vector_hnsw_idx ON review_feature_store
+    USING hnsw (hybrid_vector vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- Context Feature Store
-CREATE TABLE context_feature_store (
+CREATE TABLE IF NOT EXISTS context_feature_store (
     chunk_id UUID PRIMARY KEY,
     place_id UUID REFERENCES place(place_id) ON DELETE CASCADE,
     name TEXT,
@@ -76,3 +153,16 @@ CREATE TABLE context_feature_store (
     timestamp TIMESTAMP,
     embedding VECTOR(768)
 );
+CREATE INDEX IF NOT EXISTS context_feature_store_place_id_idx ON context_feature_store (place_id);
+CREATE INDEX IF NOT EXISTS context_feature_store_timestamp_idx ON context_feature_store (timestamp);
+CREATE INDEX IF NOT EXISTS context_feature_store_embedding_hnsw_idx ON context_feature_store
+    USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Progress of chunked CSV ingestion, keyed by file content hash
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+    content_hash TEXT PRIMARY KEY,
+    file_path TEXT,
+    rows_done BIGINT NOT NULL,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
@@ -0,0 +1,124 @@
+import os
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator
+import numpy as np
+from qdrant_client.http.models import PointStruct, PayloadSchemaType
+
+## Batched, parallel upserts into the Qdrant collections declared in schema/qdrant/*.json.
+## Points are grouped into batches of batch_size and sent by `parallel` threads sharing one client
+## (get_qdrant_client() or QdrantClient(":memory:") / QdrantClient(path=...) for local runs); at most
+## 2 * parallel batches are in flight, so memory stays bounded on large inputs.
+## "payload_indexes" in a schema file lists the payload fields to index (types from "payload_schema");
+## without them every filtered search (place_id, category, rating, timestamp) scans all points.
+
+QDRANT_SCHEMA_DIR = os.path.join(os.path.dirname(__file__), 'qdrant')
+
+def load_collection_schema(name: str) -> dict:
+    with open(os.path.join(QDRANT_SCHEMA_DIR, f"{name}.json"), 'r') as f:
+        return json.load(f)
+
+# Creates the declared payload indexes the collection does not have yet; returns the fields indexed now
+def ensure_payload_indexes(client, schema: dict) -> list[str]:
+    existing = client.get_collection(schema["name"]).payload_schema or {}
+    created = []
+    for field in schema.get("payload_indexes", []):
+        if field in existing:
+            continue
+        client.create_payload_index(
+            collection_name=schema["name"],
+            field_name=field,
+            field_schema=PayloadSchemaType(schema["payload_schema"][field]),
+            wait=True
+        )
+        created.append(field)
+    return created
+
+# JSON-safe payload value: NaN/NaT -> None, numpy scalars -> Python, datetimes -> RFC 3339
+def _payload_value(value):
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime):
+        return None if value != value else value.isoformat() # NaT compares unequal to itself
+    return value
+
+# Points from a frame with one row per point (e.g. FeatureEngine.build_feature_store) and one array of
+# row vectors per named vector. Payload fields are the frame columns listed in the collection's payload_schema.
+def frame_points(frame, schema: dict, id_column: str, vectors: dict[str, np.ndarray]) -> Iterator[PointStruct]:
+    unknown = set(vectors) - set(schema["vectors"])
+    if unknown:
+        raise ValueError(f"Collection {schema['name']!r} has no vectors named {sorted(unknown)}")
+    for name, values in vectors.items():
+        if values.shape != (len(frame), schema["vectors"][name]["size"]):
+            raise ValueError(f"Vector {name!r} must have shape {(len(frame), schema['vectors'][name]['size'])}, got {values.shape}")
+    fields = [column for column in frame.columns if column in schema["payload_schema"]]
+    columns = [frame[column].tolist() for column in fields]
+    ids = frame[id_column].astype(str).tolist()
+    for i, point_id in enumerate(ids):
+        yield PointStruct(
+            id=point_id,
+            vector={name: values[i].tolist() for name, values in vectors.items()},
+            payload={field: _payload_value(column[i]) for field, column in zip(fields, columns)}
+        )
+
+def _batched(points: Iterable[PointStruct], size: int) -> Iterator[list[PointStruct]]:
+    it = iter(points)
+    while batch := list(islice(it, size)):
+        yield batch
+
+class QdrantWriter:
+    def __init__(self, client, collection: str, batch_size: int = 256, parallel: int = 4, wait_for_indexing: bool = True):
+        self.client = client
+        self.collection = collection
+        self.batch_size = batch_size
+        self.parallel = max(1, parallel)
+        self.wait_for_indexing = wait_for_indexing # wait=False returns as soon as Qdrant has queued the batch
+        self.stats: list[dict] = []
+
+    def _send(self, batch: list[PointStruct]) -> int:
+        self.client.upsert(collection_name=self.collection, points=batch, wait=self.wait_for_indexing)
+        return len(batch)
+
+    def upsert(self, points: Iterable[PointStruct]) -> dict:
+        start = time.perf_counter()
+        count = batches = 0
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            pending = set()
+            for batch in _batched(points, self.batch_size):
+                if len(pending) >= 2 * self.parallel:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        count += future.result() # re-raises the first failed batch
+                        batches += 1
+                pending.add(executor.submit(self._send, batch))
+            for future in pending:
+                count += future.result()
+                batches += 1
+        seconds = time.perf_counter() - start
+        stats = {
+            "collection": self.collection, "points": count, "batches": batches, "seconds": seconds,
+            "points_per_second": count / seconds if seconds else 0.0
+        }
+        self.stats.append(stats)
+        print(f"Upserted {count} points into {self.collection} in {seconds:.2f}s ({stats['points_per_second']:.0f} points/s)")
+        return stats
+
+# # Test script
+# from qdrant_client import QdrantClient
+# from qdrant_client.http.models import VectorParams
+# client = QdrantClient(":memory:")
+# schema = load_collection_schema("review_feature")
+# client.create_collection(schema["name"], vectors_config={name: VectorParams(size=cfg["size"], distance=cfg["distance"]) for name, cfg in schema["vectors"].items()})
+# print(ensure_payload_indexes(client, schema))
+# import pandas as pd, uuid
+# frame = pd.DataFrame({"review_id": [str(uuid.uuid4()) for _ in range(1000)], "place_id": "p1", "rating": 4.0, "timestamp": pd.Timestamp.now()})
+# vectors = {"semantic_embedding": np.random.rand(1000, 768), "hybrid_vector": np.random.rand(1000, 768)}
+# QdrantWriter(client, schema["name"], batch_size=128, parallel=4).upsert(frame_points(frame, schema, "review_id", vectors))
@@ -0,0 +1,66 @@
+## Read helpers over the PostgreSQL schema. All of them take an open psycopg2 connection
+## (usually a pooled one: `with get_postgres_pool().connection() as conn:`).
+
+# Review ids of a user, newest first; served by review_user_id_idx
+def user_review_ids(conn, user_id: str, limit: int | None = None) -> list[str]:
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT review_id::text FROM review WHERE user_id = %s ORDER BY timestamp DESC NULLS LAST LIMIT %s",
+            (user_id, limit)
+        )
+        return [review_id for (review_id,) in cursor.fetchall()]
+
+PLACE_STATS_COLUMNS = ["review_count", "rating_count", "rating_sum", "avg_rating", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"]
+
+# Rating aggregates of a place kept by the review triggers; None if it has no reviews yet
+def place_rating_stats(conn, place_id: str) -> dict | None:
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(PLACE_STATS_COLUMNS)} FROM place_rating_stats WHERE place_id = %s", (place_id,))
+        row = cursor.fetchone()
+    return dict(zip(PLACE_STATS_COLUMNS, row)) if row else None
+
+# Recomputes every place's aggregates from the review table. migrate_postgres runs it when it adds the
+# triggers to an existing database; call it to repair drift after writes made with triggers disabled.
+# Rows of places that no longer have any review are deleted, the others are overwritten.
+REBUILD_PLACE_RATING_STATS_SQL = """
+DELETE FROM place_rating_stats s WHERE NOT EXISTS (SELECT 1 FROM review r WHERE r.place_id = s.place_id);
+INSERT INTO place_rating_stats (place_id, review_count, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5)
+SELECT place_id, count(*), count(rating), COALESCE(sum(rating), 0),
+       count(*) FILTER (WHERE round(rating) = 1), count(*) FILTER (WHERE round(rating) = 2),
+       count(*) FILTER (WHERE round(rating) = 3), count(*) FILTER (WHERE round(rating) = 4),
+       count(*) FILTER (WHERE round(rating) = 5)
+FROM review WHERE place_id IS NOT NULL GROUP BY place_id
+ON CONFLICT (place_id) DO UPDATE SET
+    review_count = EXCLUDED.review_count, rating_count = EXCLUDED.rating_count, rating_sum = EXCLUDED.rating_sum,
+    rating_1 = EXCLUDED.rating_1, rating_2 = EXCLUDED.rating_2, rating_3 = EXCLUDED.rating_3,
+    rating_4 = EXCLUDED.rating_4, rating_5 = EXCLUDED.rating_5;
+"""
+
+def rebuild_place_rating_stats(conn) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute("LOCK TABLE review IN SHARE MODE") # no concurrent writes while recounting
+        cursor.execute(REBUILD_PLACE_RATING_STATS_SQL)
+    conn.commit()
+
+# place.avg_rating / num_reviews of places whose statistics come from their stored reviews (Kaggle), copied
+# from place_rating_stats; Google Maps places keep the statistics scraped from Maps. Runs in the caller's
+# transaction, after the reviews are written, so the columns match the committed reviews.
+SYNC_PLACE_RATING_COLUMNS_SQL = """
+UPDATE place p SET avg_rating = s.avg_rating, num_reviews = s.review_count
+FROM place_rating_stats s
+WHERE s.place_id = p.place_id AND p.place_id = ANY(%s::uuid[]);
+"""
+
+def sync_place_rating_columns(conn, place_ids: list[str]) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute(SYNC_PLACE_RATING_COLUMNS_SQL, (list(place_ids),))
+
+# One-off for databases created before review_user_id_idx existed. Legacy users.reviews arrays can be
+# dropped afterwards (UPDATE users SET reviews = NULL) since nothing reads them anymore.
+BACKFILL_SQL = "CREATE INDEX IF NOT EXISTS review_user_id_idx ON review (user_id);"
+
+if __name__ == "__main__":
+    from connect_db import get_postgres_pool
+    with get_postgres_pool().connection() as conn, conn.cursor() as cursor:
+        cursor.execute(BACKFILL_SQL)
+    print("Created review_user_id_idx")
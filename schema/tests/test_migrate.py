@@ -0,0 +1,131 @@
+import os
+import sys
+import uuid
+import pytest
+
+## Upgrade tests for migrate_postgres against a live PostgreSQL with pgvector (config/docker-compose.yml).
+## Each test runs in a scratch database created next to POSTGRES_DB and dropped afterwards; the tests are
+## skipped when no server is reachable or the role may not create databases.
+## baseline_tables.sql is the schema the project started from (plain CREATE TABLE, no migrations table).
+
+SCHEMA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCHEMA_DIR)
+
+psycopg2 = pytest.importorskip("psycopg2")
+import migrate
+from connect_db import postgres_config
+
+BASELINE_SQL = os.path.join(os.path.dirname(__file__), "baseline_tables.sql")
+
+@pytest.fixture
+def scratch_db():
+    config = {key: value for key, value in postgres_config().items() if value}
+    name = f"oqf_migrate_test_{uuid.uuid4().hex[:8]}"
+    try:
+        admin = psycopg2.connect(**{**config, "dbname": "postgres"})
+    except psycopg2.Error as e:
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE {name}")
+    except psycopg2.Error as e:
+        admin.close()
+        pytest.skip(f"Cannot create a scratch database: {e}")
+    conn = psycopg2.connect(**{**config, "dbname": name})
+    try:
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.close()
+
+def load_baseline(conn) -> None:
+    with open(BASELINE_SQL, "r") as f:
+        sql = f.read()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+        conn.commit()
+    except psycopg2.errors.FeatureNotSupported as e:
+        pytest.skip(f"pgvector is not installed: {e}")
+    except psycopg2.errors.UndefinedFile as e:
+        pytest.skip(f"pgvector is not installed: {e}")
+
+def live_indexes(conn) -> set[str]:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+        return {name for (name,) in cursor.fetchall()}
+
+def test_upgrade_from_baseline_keeps_data(scratch_db):
+    conn = scratch_db
+    load_baseline(conn)
+    place_id, user_id, review_id = (str(uuid.uuid4()) for _ in range(3))
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO place (place_id, name, category) VALUES (%s, 'Cafe', 'cafe')", (place_id,))
+        cursor.execute("INSERT INTO users (user_id, name) VALUES (%s, 'Ann')", (user_id,))
+        cursor.execute(
+            "INSERT INTO review (review_id, place_id, user_id, user_name, rating, text) VALUES (%s, %s, %s, 'Ann', 4, 'Good coffee')",
+            (review_id, place_id, user_id)
+        )
+    conn.commit()
+
+    changes = migrate.migrate_postgres(conn)
+
+    assert "create table place_rating_stats" in changes
+    assert "rebuild place_rating_stats" in changes
+    with open(migrate.sql_path, "r") as f:
+        declared = migrate.declared_columns(f.read())
+    with conn.cursor() as cursor:
+        live = migrate.live_columns(cursor)
+        cursor.execute("SELECT text FROM review WHERE review_id = %s", (review_id,))
+        assert cursor.fetchone() == ("Good coffee",)
+        # Triggers created by the migration work on the upgraded tables
+        cursor.execute("INSERT INTO review (review_id, place_id, rating) VALUES (%s, %s, 2)", (str(uuid.uuid4()), place_id))
+        cursor.execute("SELECT review_count FROM place_rating_stats WHERE place_id = %s", (place_id,))
+        assert cursor.fetchone() == (2,) # the baseline review was counted when the migration created the table
+    conn.rollback()
+    for table, columns in declared.items():
+        assert set(columns) <= live[table]
+    assert {"review_user_id_idx", "review_feature_store_place_id_idx", "review_feature_store_semantic_embedding_hnsw_idx"} <= live_indexes(conn)
+
+    assert migrate.migrate_postgres(conn) == [] # the recorded version is current
+
+def test_index_on_added_column(scratch_db, tmp_path, monkeypatch):
+    conn = scratch_db
+    load_baseline(conn)
+    migrate.migrate_postgres(conn)
+    # A new column and an index on it, in the same schema change
+    with open(migrate.sql_path, "r") as f:
+        sql = f.read()
+    table_start = "CREATE TABLE IF NOT EXISTS ingest_checkpoint (\n"
+    assert table_start in sql
+    sql = sql.replace(table_start, table_start + "    source TEXT,\n")
+    sql += "\nCREATE INDEX IF NOT EXISTS ingest_checkpoint_source_idx ON ingest_checkpoint (source);\n"
+    changed_sql = tmp_path / "tables.sql"
+    changed_sql.write_text(sql)
+    monkeypatch.setattr(migrate, "sql_path", str(changed_sql))
+
+    changes = migrate.migrate_postgres(conn)
+
+    assert changes == ["add column ingest_checkpoint.source"]
+    assert "ingest_checkpoint_source_idx" in live_indexes(conn)
+
+def test_split_statements_keeps_function_bodies():
+    sql = """
+    -- comment; not a statement
+    CREATE TABLE t (a TEXT DEFAULT 'x;y');
+    CREATE OR REPLACE FUNCTION f() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        UPDATE t SET a = 'z'; -- inside the body
+        RETURN NULL;
+    END;
+    $$;
+    /* block; comment */ CREATE INDEX i ON t (a)
+    """
+    statements = migrate.split_statements(sql)
+    assert len(statements) == 3
+    assert statements[0] == "CREATE TABLE t (a TEXT DEFAULT 'x;y')"
+    assert statements[1].startswith("CREATE OR REPLACE FUNCTION") and statements[1].endswith("$$")
+    assert statements[2] == "CREATE INDEX i ON t (a)"
@@ -0,0 +1,100 @@
+from typing import Sequence
+import numpy as np
+
+## Top-k cosine similarity search over the pgvector columns of the feature stores.
+## Unfiltered queries walk the HNSW/IVFFlat index (see tables.sql); ef_search (HNSW) or probes (IVFFlat)
+## trade recall for latency per query. Place-filtered queries first narrow the rows with the place_id index
+## and rank that subset exactly: pgvector applies a WHERE clause after the index scan, so an ANN scan
+## followed by a selective filter can return fewer than k rows. exact=True disables index scans to get the
+## ground truth (see vector_search_benchmark.py).
+## All functions take an open psycopg2 connection (e.g. from get_postgres_pool().connection()); search
+## settings are SET LOCAL, so they last until the caller's transaction ends.
+
+VECTOR_COLUMNS = {
+    "review_feature_store": ["semantic_embedding", "hybrid_vector"],
+    "context_feature_store": ["embedding"]
+}
+INDEX_METHODS = ("hnsw", "ivfflat")
+
+def vector_literal(embedding: Sequence[float] | np.ndarray) -> str:
+    return "[" + ",".join(map(repr, np.asarray(embedding, dtype=np.float32).tolist())) + "]"
+
+def index_name(table: str, column: str, method: str) -> str:
+    return f"{table}_{column}_{method}_idx"
+
+# (Re)builds the ANN index of one column with the given build parameters; other ANN indexes on it are dropped.
+# HNSW: m (graph degree), ef_construction. IVFFlat: lists (rows / 1000 is a good start up to 1M rows);
+# IVFFlat must be built after the table holds representative data.
+def create_vector_index(conn, table: str, column: str, method: str = "hnsw", m: int = 16, ef_construction: int = 64,
+                        lists: int = 100, concurrently: bool = False) -> str:
+    if method not in INDEX_METHODS:
+        raise ValueError(f"method must be one of {INDEX_METHODS}, got {method!r}")
+    options = f"m = {int(m)}, ef_construction = {int(ef_construction)}" if method == "hnsw" else f"lists = {int(lists)}"
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    name = index_name(table, column, method)
+    autocommit = conn.autocommit
+    if concurrently:
+        conn.autocommit = True # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    try:
+        with conn.cursor() as cursor:
+            for other in INDEX_METHODS:
+                cursor.execute(f"DROP INDEX {concurrent}IF EXISTS {index_name(table, column, other)}")
+            cursor.execute(
+                f"CREATE INDEX {concurrent}{name} ON {table} USING {method} ({column} vector_cosine_ops) WITH ({options})"
+            )
+        if not concurrently:
+            conn.commit()
+    finally:
+        if concurrently:
+            conn.autocommit = autocommit
+    return name
+
+def _set_search_params(cursor, ef_search: int | None, probes: int | None, exact: bool) -> None:
+    if ef_search is not None:
+        cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(int(ef_search)),))
+    if probes is not None:
+        cursor.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(int(probes)),))
+    if exact:
+        cursor.execute("SELECT set_config('enable_indexscan', 'off', true)")
+        cursor.execute("SELECT set_config('enable_bitmapscan', 'off', true)")
+
+# Generic top-k: rows of `table` nearest to `embedding` in `column`, as dicts of `columns` plus "distance"
+# (cosine distance, 0 = same direction). ef_search must be >= k for HNSW to return k rows.
+def nearest(conn, table: str, column: str, embedding, k: int = 10, columns: Sequence[str] = (),
+            place_id: str | None = None, ef_search: int | None = None, probes: int | None = None,
+            exact: bool = False) -> list[dict]:
+    select = ", ".join([*columns, f"{column} <=> %(query)s::vector AS distance"])
+    params = {"query": vector_literal(embedding), "k": k, "place_id": place_id}
+    if place_id is None:
+        sql = f"SELECT {select} FROM {table} WHERE {column} IS NOT NULL ORDER BY distance LIMIT %(k)s"
+    else:
+        # Distances are computed inside the materialized subset, which keeps the planner off the ANN index
+        sql = (
+            f"WITH candidates AS MATERIALIZED (SELECT {select} FROM {table} WHERE place_id = %(place_id)s AND {column} IS NOT NULL) "
+            f"SELECT * FROM candidates ORDER BY distance LIMIT %(k)s"
+        )
+    with conn.cursor() as cursor:
+        _set_search_params(cursor, ef_search, probes, exact)
+        cursor.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+REVIEW_RESULT_COLUMNS = ["review_id::text AS review_id", "place_id::text AS place_id", "rating", "text_chunk", "timestamp"]
+CONTEXT_RESULT_COLUMNS = ["chunk_id::text AS chunk_id", "place_id::text AS place_id", "section_title", "text_chunk", "source_type"]
+
+def similar_reviews(conn, embedding, k: int = 10, place_id: str | None = None, column: str = "semantic_embedding",
+                    ef_search: int | None = None, probes: int | None = None, exact: bool = False) -> list[dict]:
+    if column not in VECTOR_COLUMNS["review_feature_store"]:
+        raise ValueError(f"column must be one of {VECTOR_COLUMNS['review_feature_store']}, got {column!r}")
+    return nearest(conn, "review_feature_store", column, embedding, k, REVIEW_RESULT_COLUMNS, place_id, ef_search, probes, exact)
+
+def similar_contexts(conn, embedding, k: int = 10, place_id: str | None = None,
+                     ef_search: int | None = None, probes: int | None = None, exact: bool = False) -> list[dict]:
+    return nearest(conn, "context_feature_store", "embedding", embedding, k, CONTEXT_RESULT_COLUMNS, place_id, ef_search, probes, exact)
+
+# # Test script
+# from connect_db import get_postgres_pool
+# query = np.random.rand(768)
+# with get_postgres_pool().connection() as conn:
+#     print(similar_reviews(conn, query, k=5, ef_search=100))
+#     print(similar_contexts(conn, query, k=5, place_id="00000000-0000-0000-0000-000000000001"))
@@ -0,0 +1,107 @@
+import io
+import time
+import argparse
+import numpy as np
+from connect_db import get_postgres_pool, close_shared_connections
+from vector_search import vector_literal, create_vector_index, nearest
+
+## Recall and latency of pgvector ANN search against exact search, on a local pgvector instance.
+## By default a scratch table of synthetic clustered embeddings is created (and dropped afterwards), so the
+## run does not depend on what the feature stores hold; --table/--column benchmark a real store instead
+## (its ANN index on that column is rebuilt with the given build parameters).
+## For every search setting (hnsw.ef_search or ivfflat.probes) it reports recall@k against the exact top-k,
+## and p50/p95 latency next to the exact search latency.
+##   python vector_search_benchmark.py --rows 50000 --method hnsw --ef-search 10 40 100 200
+##   python vector_search_benchmark.py --rows 50000 --method ivfflat --lists 200 --probes 1 5 10 20
+
+BENCH_TABLE = "vector_search_benchmark"
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Unit vectors scattered around random cluster centers, loosely like topic-clustered text embeddings
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, rows)] + 0.5 * rng.standard_normal((rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def create_bench_table(conn, vectors: np.ndarray) -> None:
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.execute(f"CREATE TABLE {BENCH_TABLE} (id BIGINT PRIMARY KEY, embedding VECTOR({vectors.shape[1]}))")
+        buffer = io.StringIO()
+        for i, vector in enumerate(vectors):
+            buffer.write(f"{i}\t{vector_literal(vector)}\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {BENCH_TABLE} (id, embedding) FROM STDIN", buffer)
+        cursor.execute(f"ANALYZE {BENCH_TABLE}")
+    conn.commit()
+
+def run_queries(conn, table: str, column: str, id_column: str, queries: np.ndarray, k: int, **search) -> tuple[list[set], np.ndarray]:
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows = nearest(conn, table, column, query, k, [id_column], **search)
+        latencies.append(time.perf_counter() - start)
+        conn.rollback() # search settings are transaction-local
+        results.append({row[id_column] for row in rows})
+    return results, np.asarray(latencies) * 1000
+
+def report(label: str, results: list[set], truth: list[set], latencies: np.ndarray, k: int) -> None:
+    recall = np.mean([len(found & expected) / min(k, len(expected) or 1) for found, expected in zip(results, truth)])
+    print(f"{label:<22} recall@{k} {recall:.3f}   p50 {np.percentile(latencies, 50):7.2f} ms   p95 {np.percentile(latencies, 95):7.2f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark pgvector ANN search against exact search")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--lists", type=int, default=100)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 40, 100, 200])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--table", help="benchmark an existing table instead of synthetic data")
+    parser.add_argument("--column", default="semantic_embedding")
+    parser.add_argument("--id-column", default="review_id")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic table")
+    args = parser.parse_args()
+
+    with get_postgres_pool().connection() as conn:
+        if args.table:
+            table, column, id_column = args.table, args.column, args.id_column
+            with conn.cursor() as cursor:
+                # Queries are stored vectors perturbed with noise, so they are realistic for the data
+                cursor.execute(f"SELECT {column}::text FROM {table} WHERE {column} IS NOT NULL ORDER BY random() LIMIT %s", (args.queries,))
+                stored = np.array([np.array(text.strip("[]").split(","), dtype=np.float32) for (text,) in cursor.fetchall()])
+            conn.rollback()
+            queries = stored + 0.05 * np.random.default_rng(1).standard_normal(stored.shape).astype(np.float32)
+        else:
+            table, column, id_column = BENCH_TABLE, "embedding", "id"
+            start = time.perf_counter()
+            # Queries come from the same clusters as the stored vectors but are not stored themselves
+            vectors = synthetic_vectors(args.rows + args.queries, args.dim, args.clusters)
+            create_bench_table(conn, vectors[:args.rows])
+            print(f"Loaded {args.rows} synthetic vectors in {time.perf_counter() - start:.1f}s")
+            queries = vectors[args.rows:]
+
+        start = time.perf_counter()
+        create_vector_index(conn, table, column, args.method, m=args.m, ef_construction=args.ef_construction, lists=args.lists)
+        print(f"Built {args.method} index in {time.perf_counter() - start:.1f}s")
+
+        truth, exact_latencies = run_queries(conn, table, column, id_column, queries, args.k, exact=True)
+        report("exact", truth, truth, exact_latencies, args.k)
+        settings = [("ef_search", v) for v in args.ef_search] if args.method == "hnsw" else [("probes", v) for v in args.probes]
+        for name, value in settings:
+            results, latencies = run_queries(conn, table, column, id_column, queries, args.k, **{name: value})
+            report(f"{args.method} {name}={value}", results, truth, latencies, args.k)
+
+        if not args.table and not args.keep:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {BENCH_TABLE}")
+            conn.commit()
+    close_shared_connections()
+
+if __name__ == "__main__":
+    main()